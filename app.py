@@ -4,8 +4,11 @@ from backend.routes import routes_app
 from backend.config import LocalDevelopmentConfig
 from flask_security import Security, SQLAlchemyUserDatastore
 from werkzeug.security import generate_password_hash
-from backend.extensions import cache
+from backend.extensions import cache, spot_index, token_cache
 from backend.celery.celery_factory import celery_init_app
+from backend.occupancy import rebuild_counts, counters_out_of_sync
+from backend.user_rollups import rebuild_rollups, rollups_missing
+from backend.migrations import upgrade as upgrade_schema, schema_version
 import flask_excel as excel
 
 def create_app():
@@ -15,6 +18,8 @@ def create_app():
     # Initialize the database
     db.init_app(app)
     cache.init_app(app) 
+    spot_index.init_app(app)
+    token_cache.init_app(app, shared=cache)
     
     excel.init_excel(app)  # Initialize Flask-Excel
 
@@ -30,6 +35,8 @@ def create_app():
     api.init_app(app)
     with app.app_context():
         db.create_all()
+        # create_all skips indexes on tables that already exist
+        upgrade_schema()
 
         # Create roles and users
         if not datastore.find_role("admin"):
@@ -42,6 +49,40 @@ def create_app():
                                    password=generate_password_hash('admin'),
                                    roles=['admin'])
         db.session.commit()
+
+        # Backfill occupancy counters for databases created before they existed
+        if counters_out_of_sync():
+            rebuild_counts()
+            db.session.commit()
+
+        spot_index.rebuild()
+
+        if rollups_missing():
+            rebuild_rollups()
+            db.session.commit()
+
+    @app.cli.command('upgrade-schema')
+    def upgrade_schema_command():
+        """Apply pending schema migrations."""
+        for version, description in upgrade_schema():
+            print(f"Applied migration {version}: {description}")
+        with db.engine.connect() as connection:
+            print(f"Schema is at version {schema_version(connection)}")
+
+    @app.cli.command('reconcile-occupancy')
+    def reconcile_occupancy():
+        """Rebuild per-lot occupancy counters from the spot table."""
+        lot_count = rebuild_counts()
+        db.session.commit()
+        print(f"Reconciled occupancy counters for {lot_count} parking lots")
+
+    @app.cli.command('rebuild-user-rollups')
+    def rebuild_user_rollups():
+        """Rebuild per-user usage rollups from the reservation table."""
+        row_count = rebuild_rollups()
+        db.session.commit()
+        print(f"Rebuilt {row_count} user usage rollup rows")
+
     return app
     
 app = create_app()
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, User, ParkingLot, ParkingSpot, Reservation, LotOccupancy, AdminSummarySnapshot
+from .occupancy_history import occupancy_history
+
+# The reservation-wide parts of /api/admin-summary (revenue, session counts)
+# scan the whole table, so they are kept in a one-row snapshot that the
+# refresh-admin-summary beat task recomputes. Lot and user figures are cheap
+# and always read live. dailyActivity comes from the occupancy samples.
+
+SNAPSHOT_ID = 1
+DAILY_ACTIVITY_DAYS = 30
+
+
+def compute_reservation_totals():
+    """Revenue by lot plus session counts: one grouped join and one counting scan"""
+    revenue_query = db.session.query(
+        ParkingLot.id,
+        ParkingLot.prime_location_name,
+        func.sum(Reservation.parking_cost).label('revenue')
+    ).join(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)\
+     .join(Reservation, Reservation.spot_id == ParkingSpot.id)\
+     .filter(Reservation.parking_cost.isnot(None))\
+     .group_by(ParkingLot.id, ParkingLot.prime_location_name)
+    revenue_by_lot = [
+        {
+            'lotId': row.id,
+            'lotName': row.prime_location_name,
+            'revenue': float(row.revenue or 0)
+        }
+        for row in revenue_query.all()
+    ]
+    total_sessions, active_sessions = db.session.query(
+        func.count(Reservation.id),
+        func.count(case((Reservation.leaving_timestamp.is_(None), 1)))
+    ).one()
+    return {
+        'revenueByLot': revenue_by_lot,
+        'totalSessions': total_sessions,
+        'activeSessions': active_sessions,
+        'dailyActivity': daily_activity()
+    }
+
+
+def daily_activity(days=DAILY_ACTIVITY_DAYS):
+    """Per-day occupancy, released sessions and revenue from the occupancy samples"""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        {
+            'date': day['bucket'][:10],
+            'newUsers': 0,
+            'sessions': day['sessions'],
+            'revenue': day['revenue'],
+            'occupancyRate': day['occupancyRate']
+        }
+        for day in occupancy_history(today - timedelta(days=days - 1), today + timedelta(days=1), bucket='day')
+    ]
+
+
+def refresh_snapshot():
+    """Recompute the snapshot inside the caller's transaction and return its payload"""
+    payload = compute_reservation_totals()
+    # Upsert, so two requests refreshing a stale snapshot at once both succeed
+    stmt = insert(AdminSummarySnapshot).values(id=SNAPSHOT_ID, computed_at=datetime.now(), payload=payload)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={'computed_at': stmt.excluded.computed_at, 'payload': stmt.excluded.payload}
+    ))
+    return payload
+
+
+def reservation_totals(max_age):
+    """Snapshot payload, recomputed on the spot when missing or older than max_age seconds"""
+    snapshot = db.session.get(AdminSummarySnapshot, SNAPSHOT_ID)
+    if snapshot is not None and datetime.now() - snapshot.computed_at <= timedelta(seconds=max_age):
+        return snapshot.payload, snapshot.computed_at
+    payload = refresh_snapshot()
+    db.session.commit()
+    return payload, datetime.now()
+
+
+def build_admin_summary(max_age):
+    totals, computed_at = reservation_totals(max_age)
+
+    lots = db.session.query(
+        ParkingLot.id,
+        ParkingLot.prime_location_name,
+        func.coalesce(LotOccupancy.available_spots, 0),
+        func.coalesce(LotOccupancy.occupied_spots, 0)
+    ).outerjoin(LotOccupancy, LotOccupancy.lot_id == ParkingLot.id)\
+     .order_by(ParkingLot.id)\
+     .all()
+    parking_lot_stats = [
+        {
+            'lotId': lot_id,
+            'lotName': name,
+            'totalSpots': available_spots + occupied_spots,
+            'occupiedSpots': occupied_spots,
+            'availableSpots': available_spots
+        }
+        for lot_id, name, available_spots, occupied_spots in lots
+    ]
+
+    total_users, total_spots = db.session.query(
+        db.session.query(func.count(User.id)).scalar_subquery(),
+        db.session.query(func.count(ParkingSpot.id)).scalar_subquery()
+    ).one()
+
+    overview = {
+        'totalRevenue': round(sum(lot['revenue'] for lot in totals['revenueByLot']), 2),
+        'totalUsers': total_users,
+        'newUsers': 0,
+        'totalSessions': totals['totalSessions'],
+        'activeSessions': totals['activeSessions'],
+        'totalParkingLots': len(parking_lot_stats),
+        'totalSpots': total_spots
+    }
+
+    return {
+        'overview': overview,
+        'revenueByLot': totals['revenueByLot'],
+        'parkingLotStats': parking_lot_stats,
+        'dailyActivity': totals.get('dailyActivity', []),
+        'paymentMethods': [],
+        'computedAt': computed_at.isoformat()
+    }
@@ -0,0 +1,121 @@
+from sqlalchemy import select, update, insert, delete, event
+from sqlalchemy.orm import Session
+from .models import db, ParkingSpot
+from .occupancy import adjust_counts
+from .extensions import spot_index
+from .cache_versions import touch_lot
+
+CLAIM_ATTEMPTS = 3
+
+
+def _index_on_commit(change, lot_id, spot_id):
+    """Apply a free-spot index change once the current transaction commits"""
+    db.session.info.setdefault('spot_index_changes', []).append((change, lot_id, spot_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_spot_index_changes(session):
+    for change, lot_id, spot_id in session.info.pop('spot_index_changes', ()):
+        if change == 'free':
+            spot_index.mark_free(lot_id, spot_id)
+        else:
+            spot_index.mark_taken(lot_id, spot_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_spot_index_changes(session):
+    session.info.pop('spot_index_changes', None)
+
+
+def claim_spot(spot_id):
+    """Occupy a specific spot if it is still available. Returns its lot id, or None if it was taken"""
+    row = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot_id, ParkingSpot.status == 'A')
+        .values(status='O')
+        .returning(ParkingSpot.lot_id)
+    ).first()
+    if row is None:
+        return None
+    adjust_counts(row.lot_id, available=-1, occupied=1)
+    _index_on_commit('taken', row.lot_id, spot_id)
+    touch_lot(row.lot_id)
+    return row.lot_id
+
+
+def claim_any_spot(lot_id):
+    """Pick and occupy a free spot in a lot. Returns the spot id, or None if the lot is full"""
+    # Try the free-spot index first, then fall back to picking and claiming in one statement
+    hint = spot_index.next_free(lot_id)
+    if hint is not None:
+        if claim_spot(hint) is not None:
+            return hint
+        # A failed claim proves the hint stale, committed or not
+        spot_index.mark_taken(lot_id, hint)
+
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate = select(ParkingSpot.id)\
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')\
+            .order_by(ParkingSpot.id)\
+            .limit(1)\
+            .scalar_subquery()
+        row = db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.id == candidate, ParkingSpot.status == 'A')
+            .values(status='O')
+            .returning(ParkingSpot.id)
+        ).first()
+        if row is not None:
+            adjust_counts(lot_id, available=-1, occupied=1)
+            _index_on_commit('taken', lot_id, row.id)
+            touch_lot(lot_id)
+            return row.id
+        # A concurrent writer may have taken our candidate between the
+        # subquery and the update; only give up once the lot is really full
+        if not ParkingSpot.query.filter_by(lot_id=lot_id, status='A').first():
+            return None
+    return None
+
+
+def release_spot(spot_id):
+    """Free an occupied spot. Returns its lot id, or None if it was not occupied"""
+    row = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot_id, ParkingSpot.status != 'A')
+        .values(status='A')
+        .returning(ParkingSpot.lot_id)
+    ).first()
+    if row is None:
+        return None
+    adjust_counts(row.lot_id, available=1, occupied=-1)
+    _index_on_commit('free', row.lot_id, spot_id)
+    touch_lot(row.lot_id)
+    return row.lot_id
+
+
+def add_spots(lot_id, count):
+    """Insert count free spots for a lot in one executemany, inside the caller's transaction"""
+    if count <= 0:
+        return 0
+    db.session.execute(insert(ParkingSpot), [{'lot_id': lot_id, 'status': 'A'} for _ in range(count)])
+    adjust_counts(lot_id, available=count)
+    touch_lot(lot_id)
+    return count
+
+
+def remove_free_spots(lot_id, count):
+    """Delete up to count free spots of a lot with one set-based DELETE; returns how many went"""
+    if count <= 0:
+        return 0
+    newest_free = select(ParkingSpot.id)\
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A')\
+        .order_by(ParkingSpot.id.desc())\
+        .limit(count)
+    removed = db.session.execute(
+        delete(ParkingSpot)
+        .where(ParkingSpot.id.in_(newest_free), ParkingSpot.status == 'A')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    adjust_counts(lot_id, available=-removed)
+    touch_lot(lot_id)
+    return removed
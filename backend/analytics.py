@@ -0,0 +1,257 @@
+import calendar
+from datetime import datetime, timedelta
+import numpy as np
+from .models import db, ParkingLot, ParkingSpot, Reservation
+
+# Weekday of the datetime64 epoch (1970-01-01 was a Thursday)
+EPOCH_WEEKDAY = 3
+
+
+class ReservationColumns:
+    """A user's reservations as parallel NumPy arrays, loaded by one joined query"""
+
+    def __init__(self, rows):
+        (ids, parked, left, costs, lot_ids, prices,
+         names, addresses, pincodes, vehicles) = zip(*rows) if rows else ((),) * 10
+        self.size = len(ids)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.parked = np.array(parked, dtype='datetime64[us]')
+        self.left = np.array(left, dtype='datetime64[us]')
+        self.parking_cost = np.array([c if c is not None else np.nan for c in costs], dtype=np.float64)
+        self.lot_id = np.array([i if i is not None else -1 for i in lot_ids], dtype=np.int64)
+        self.price = np.array([p if p is not None else np.nan for p in prices], dtype=np.float64)
+        self.names = np.array(names, dtype=object)
+        self.addresses = np.array(addresses, dtype=object)
+        self.pincodes = np.array(pincodes, dtype=object)
+        self.vehicles = np.array(vehicles, dtype=object)
+
+        self.has_lot = self.lot_id >= 0
+        self.completed = ~np.isnat(self.left)
+        self.has_cost = ~np.isnan(self.parking_cost) & (self.parking_cost != 0)
+        # Same arithmetic as timedelta.total_seconds() / 3600, so sums match the Python helpers
+        micros = (self.left - self.parked).astype('timedelta64[us]').astype(np.int64)
+        self.duration = np.where(self.completed, micros.astype(np.float64) / 1e6 / 3600, 0.0)
+        fallback = np.maximum(1, np.trunc(self.duration)) * self.price
+        self.cost = np.where(self.has_cost, self.parking_cost,
+                             np.where(self.completed & self.has_lot, fallback, 0.0))
+        self.day = self.parked.astype('datetime64[D]')
+        self.hour = (self.parked.astype('datetime64[h]') - self.day).astype(np.int64)
+        self.weekday = (self.day.astype(np.int64) + EPOCH_WEEKDAY) % 7
+
+
+def load_columns(user_id, start_date=None):
+    query = db.session.query(
+        Reservation.id,
+        Reservation.parking_timestamp,
+        Reservation.leaving_timestamp,
+        Reservation.parking_cost,
+        ParkingLot.id,
+        ParkingLot.price,
+        ParkingLot.prime_location_name,
+        ParkingLot.address,
+        ParkingLot.pincode,
+        Reservation.vehicle_number
+    ).outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+     .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+     .filter(Reservation.user_id == user_id)\
+     .order_by(Reservation.id)
+    if start_date:
+        query = query.filter(Reservation.parking_timestamp >= start_date)
+    return ReservationColumns(query.all())
+
+
+def summarize(columns, period):
+    """Every /api/user-summary section computed from the columns in one pass of vectorized group-bys"""
+    return {
+        'overview': overview(columns),
+        'expenditureByLot': expenditure_by_lot(columns),
+        'timeByLot': time_by_lot(columns),
+        'recentSessions': recent_sessions(columns),
+        'statistics': statistics(columns),
+        'trends': trends(columns, period)
+    }
+
+
+def _groups(keys):
+    """Number keys by first appearance, the order a dict filled row by row would have.
+
+    Returns each row's group number and the row where every group first appears.
+    """
+    uniques, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()], first[order]
+
+
+def _sum(values):
+    # bincount adds in row order, matching a Python loop's floating point result
+    if len(values) == 0:
+        return 0
+    return float(np.bincount(np.zeros(len(values), dtype=np.int64), weights=values)[0])
+
+
+def overview(columns):
+    favorite_spot = None
+    if columns.has_lot.any():
+        names = columns.names[columns.has_lot]
+        group, first_rows = _groups(names.astype(str))
+        favorite_spot = names[first_rows[int(np.argmax(np.bincount(group)))]]
+    return {
+        'totalExpenditure': round(_sum(columns.cost), 2),
+        'totalHours': round(_sum(columns.duration[columns.completed]), 2),
+        'totalSessions': columns.size,
+        'favoriteSpot': favorite_spot
+    }
+
+
+def expenditure_by_lot(columns):
+    mask = columns.has_lot
+    if not mask.any():
+        return []
+    group, first_rows = _groups(columns.lot_id[mask])
+    spent = np.bincount(group, weights=columns.cost[mask])
+    sessions = np.bincount(group)
+    total_spent = _sum(columns.cost[mask])
+    first_rows = np.flatnonzero(mask)[first_rows]
+
+    result = []
+    for i, row in enumerate(first_rows):
+        total = float(spent[i])
+        result.append({
+            'lotName': columns.names[row],
+            'location': columns.addresses[row],
+            'totalSpent': total,
+            'sessions': int(sessions[i]),
+            'avgPerSession': total / int(sessions[i]),
+            'percentage': (total / total_spent * 100) if total_spent > 0 else 0
+        })
+    return sorted(result, key=lambda x: x['totalSpent'], reverse=True)
+
+
+def time_by_lot(columns):
+    mask = columns.has_lot & columns.completed
+    if not mask.any():
+        return []
+    group, first_rows = _groups(columns.lot_id[mask])
+    hours = np.bincount(group, weights=columns.duration[mask])
+    sessions = np.bincount(group)
+    patterns = np.zeros((len(first_rows), 24), dtype=np.int64)
+    np.add.at(patterns, (group, columns.hour[mask]), 1)
+    first_rows = np.flatnonzero(mask)[first_rows]
+
+    result = []
+    for i, row in enumerate(first_rows):
+        pattern = patterns[i]
+        peak_hour = int(np.argmax(pattern))
+        if 6 <= peak_hour <= 10:
+            usage = "Morning Rush"
+        elif 11 <= peak_hour <= 15:
+            usage = "Midday"
+        elif 16 <= peak_hour <= 20:
+            usage = "Evening Rush"
+        else:
+            usage = "Off-Peak"
+        max_pattern = int(pattern.max()) if pattern.max() > 0 else 1
+        total_hours = float(hours[i])
+        result.append({
+            'lotName': columns.names[row],
+            'totalHours': total_hours,
+            'sessions': int(sessions[i]),
+            'hourlyPattern': (pattern / max_pattern).tolist(),
+            'avgDuration': total_hours / int(sessions[i]),
+            'usagePattern': usage
+        })
+    return sorted(result, key=lambda x: x['totalHours'], reverse=True)
+
+
+def recent_sessions(columns, limit=10):
+    if not columns.size:
+        return []
+    newest = np.argsort(-columns.parked.astype(np.int64), kind='stable')[:limit]
+    now = datetime.now()
+
+    result = []
+    for row in newest:
+        if not columns.has_lot[row]:
+            continue
+        parked = columns.parked[row].item()
+        left = columns.left[row].item() if columns.completed[row] else None
+        if left:
+            duration = float(columns.duration[row])
+            status = 'completed'
+        else:
+            duration = (now - parked).total_seconds() / 3600
+            status = 'active'
+
+        if columns.has_cost[row]:
+            cost = float(columns.parking_cost[row])
+        elif duration > 0:
+            cost = max(1, int(duration)) * float(columns.price[row])
+        else:
+            cost = 0
+
+        result.append({
+            'id': int(columns.ids[row]),
+            'lotName': columns.names[row],
+            'lotAddress': columns.addresses[row],
+            'lotPincode': columns.pincodes[row],
+            'startTime': parked.isoformat(),
+            'endTime': left.isoformat() if left else None,
+            'duration': round(duration, 2),
+            'cost': round(cost, 2),
+            'status': status,
+            'vehicleNumber': columns.vehicles[row]
+        })
+    return result
+
+
+def statistics(columns):
+    if not columns.size:
+        return {
+            'mostActiveDay': 'N/A',
+            'peakHours': 'N/A',
+            'avgSessionLength': 0,
+            'totalSavings': 0
+        }
+    day_counts = np.bincount(columns.weekday, minlength=7)
+    hour_counts = np.bincount(columns.hour, minlength=24)
+    completed = int(columns.completed.sum())
+
+    most_active_day_idx = int(np.argmax(day_counts)) if day_counts.max() > 0 else 0
+    peak_hour = int(np.argmax(hour_counts)) if hour_counts.max() > 0 else 12
+    avg_session_length = _sum(columns.duration[columns.completed]) / completed if completed > 0 else 0
+    return {
+        'mostActiveDay': calendar.day_name[most_active_day_idx],
+        'peakHours': f"{peak_hour:02d}:00 - {(peak_hour+1)%24:02d}:00",
+        'avgSessionLength': round(avg_session_length, 2),
+        'totalSavings': round(columns.size * 2.5, 2)
+    }
+
+
+def trends(columns, period):
+    if not columns.size or period == 'all':
+        return []
+    try:
+        days = int(period)
+    except ValueError:
+        days = 30
+
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    offsets = (columns.day - np.datetime64(start_date, 'D')).astype(np.int64)
+    in_range = (offsets >= 0) & (offsets <= days)
+    buckets = offsets[in_range]
+    sessions = np.bincount(buckets, minlength=days + 1)
+    expenditure = np.bincount(buckets, weights=columns.cost[in_range], minlength=days + 1)
+    hours = np.bincount(buckets, weights=columns.duration[in_range], minlength=days + 1)
+
+    return [
+        {
+            'date': (start_date + timedelta(days=i)).isoformat(),
+            'expenditure': round(float(expenditure[i]), 2) if sessions[i] else 0,
+            'sessions': int(sessions[i]),
+            'hours': round(float(hours[i]), 2) if sessions[i] else 0
+        }
+        for i in range(days + 1)
+    ]
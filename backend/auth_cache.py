@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from .models import db, User
+
+CachedRole = namedtuple('CachedRole', ['id', 'name'])
+
+
+class AuthPrincipal:
+    """Cached identity behind a token.
+
+    Exposes ``id`` and ``roles`` without touching the database; any other
+    attribute (email, full_name, ...) loads the User row on first use, and
+    assignments are forwarded to that row so handlers can still update it.
+    """
+
+    def __init__(self, user_id, roles):
+        object.__setattr__(self, 'id', user_id)
+        object.__setattr__(self, 'roles', [CachedRole(*role) for role in roles])
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+
+class TokenCache:
+    """token -> (user_id, roles) with a process-local LRU in front of Flask-Caching.
+
+    invalidate() only reaches this process's LRU, so local entries live for
+    AUTH_CACHE_LOCAL_TTL seconds: other workers see a revocation that soon.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._maxsize = 10000
+        self._ttl = 300
+        self._local_ttl = 5
+        self._shared = None
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, shared=None):
+        self._maxsize = app.config.get('AUTH_CACHE_SIZE', 10000)
+        self._ttl = app.config.get('AUTH_CACHE_TTL', 300)
+        self._local_ttl = min(app.config.get('AUTH_CACHE_LOCAL_TTL', 5), self._ttl)
+        self._shared = shared
+        # Role grants and revocations anywhere in the app drop the cached entry
+        if not event.contains(User.roles, 'append', self._roles_changed):
+            event.listen(User.roles, 'append', self._roles_changed)
+            event.listen(User.roles, 'remove', self._roles_changed)
+
+    def resolve(self, token):
+        """Return an AuthPrincipal for the token, or None if no user owns it"""
+        entry = self._get_local(token)
+        if entry is not None:
+            self._count('local_hits')
+            return AuthPrincipal(*entry)
+
+        if self._shared is not None:
+            entry = self._shared.get(self._shared_key(token))
+            if entry is not None:
+                self._count('shared_hits')
+                self._set_local(token, entry)
+                return AuthPrincipal(*entry)
+
+        self._count('misses')
+        user = User.query.options(selectinload(User.roles)).filter_by(fs_uniquifier=token).first()
+        if not user:
+            return None
+        entry = (user.id, tuple((role.id, role.name) for role in user.roles))
+        self._set_local(token, entry)
+        if self._shared is not None:
+            self._shared.set(self._shared_key(token), entry, timeout=self._ttl)
+        return AuthPrincipal(*entry)
+
+    def invalidate(self, token):
+        """Forget a token in both tiers, e.g. after its user's profile, password or roles change"""
+        with self._lock:
+            self._local.pop(token, None)
+            self.stats['invalidations'] += 1
+        if self._shared is not None:
+            self._shared.delete(self._shared_key(token))
+
+    def invalidate_user(self, user):
+        self.invalidate(user.fs_uniquifier)
+
+    def _roles_changed(self, user, role, initiator):
+        if user.fs_uniquifier:
+            self.invalidate(user.fs_uniquifier)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats['local_hits'] + self.stats['shared_hits'] + self.stats['misses']
+            hits = self.stats['local_hits'] + self.stats['shared_hits']
+            return dict(
+                self.stats,
+                local_size=len(self._local),
+                hit_rate=round(hits / lookups, 4) if lookups else 0
+            )
+
+    def _get_local(self, token):
+        with self._lock:
+            item = self._local.get(token)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._local[token]
+                return None
+            self._local.move_to_end(token)
+            return entry
+
+    def _set_local(self, token, entry):
+        with self._lock:
+            self._local[token] = (time.monotonic() + self._local_ttl, entry)
+            self._local.move_to_end(token)
+            while len(self._local) > self._maxsize:
+                self._local.popitem(last=False)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _shared_key(token):
+        return f'auth-token:{token}'
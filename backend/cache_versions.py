@@ -0,0 +1,67 @@
+import time
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .extensions import cache
+from .models import db
+
+# Lot and spot reads are keyed by generation counters, so they can live for
+# minutes: every write bumps the counters and the old entries are never read again
+LOT_CACHE_TIMEOUT = 300
+
+GLOBAL_GENERATION = 'generation:lots'
+
+
+def _lot_generation_key(lot_id):
+    return f'generation:lot:{lot_id}'
+
+
+def generation(key):
+    value = cache.get(key)
+    if value is None:
+        # Seed from the clock so a lost counter never resurrects old entries
+        cache.add(key, int(time.time() * 1000), timeout=0)
+        value = cache.get(key)
+    return value
+
+
+def _bump(key):
+    if cache.cache.inc(key) is None:
+        cache.set(key, int(time.time() * 1000), timeout=0)
+
+
+def touch_lot(lot_id=None):
+    """Invalidate cached reads for a lot (and every listing) once the current transaction commits"""
+    pending = db.session.info.setdefault('touched_lots', set())
+    pending.add(lot_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_touched_lots(session):
+    touched = session.info.pop('touched_lots', None)
+    if not touched:
+        return
+    for lot_id in touched:
+        if lot_id is not None:
+            _bump(_lot_generation_key(lot_id))
+    _bump(GLOBAL_GENERATION)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_touched_lots(session):
+    session.info.pop('touched_lots', None)
+
+
+def lots_key(prefix):
+    """Cache key builder for views that may change with any lot or spot write"""
+    def make_key():
+        return f'{prefix}{request.path}/g{generation(GLOBAL_GENERATION)}'
+    return make_key
+
+
+def lot_key(prefix):
+    """Cache key builder for views of a single lot (lot_id taken from the URL)"""
+    def make_key():
+        lot_id = request.view_args.get('lot_id')
+        return f'{prefix}{request.path}/g{generation(_lot_generation_key(lot_id))}'
+    return make_key
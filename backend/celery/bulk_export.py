@@ -0,0 +1,159 @@
+import csv
+import os
+import zipfile
+from backend.models import db, User, ParkingLot, ParkingSpot, Reservation
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+# All reservations with user, spot and lot fields denormalized in, streamed from
+# one query and written CSV and/or Parquet a batch at a time, so memory is
+# bounded by EXPORT_BATCH_SIZE rows in the one open output part
+
+EXPORT_BATCH_SIZE = 5000
+EXPORT_FORMATS = ('csv', 'parquet')
+
+EXPORT_COLUMNS = [
+    ('reservation_id', Reservation.id),
+    ('user_id', Reservation.user_id),
+    ('user_email', User.email),
+    ('vehicle_number', Reservation.vehicle_number),
+    ('parking_timestamp', Reservation.parking_timestamp),
+    ('leaving_timestamp', Reservation.leaving_timestamp),
+    ('parking_cost', Reservation.parking_cost),
+    ('spot_id', Reservation.spot_id),
+    ('spot_status', ParkingSpot.status),
+    ('lot_id', ParkingLot.id),
+    ('lot_name', ParkingLot.prime_location_name),
+    ('lot_address', ParkingLot.address),
+    ('lot_pincode', ParkingLot.pincode),
+    ('lot_price', ParkingLot.price),
+]
+
+
+def _arrow_schema():
+    return pa.schema([
+        ('reservation_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('user_email', pa.string()),
+        ('vehicle_number', pa.string()),
+        ('parking_timestamp', pa.timestamp('us')),
+        ('leaving_timestamp', pa.timestamp('us')),
+        ('parking_cost', pa.float64()),
+        ('spot_id', pa.int64()),
+        ('spot_status', pa.string()),
+        ('lot_id', pa.int64()),
+        ('lot_name', pa.string()),
+        ('lot_address', pa.string()),
+        ('lot_pincode', pa.string()),
+        ('lot_price', pa.float64()),
+    ])
+
+
+def export_rows(start=None, end=None, by_time=False):
+    """Denormalized reservation rows parked in [start, end), streamed in id order,
+    or in parking time order when by_time is set"""
+    query = db.session.query(*[column for _, column in EXPORT_COLUMNS])\
+        .select_from(Reservation)\
+        .outerjoin(User, User.id == Reservation.user_id)\
+        .outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+    if start is not None:
+        query = query.filter(Reservation.parking_timestamp >= start)
+    if end is not None:
+        query = query.filter(Reservation.parking_timestamp < end)
+    if by_time:
+        query = query.order_by(Reservation.parking_timestamp, Reservation.id)
+    else:
+        query = query.order_by(Reservation.id)
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+class _PartWriter:
+    """CSV and Parquet writers for one output part (the whole export or one month)"""
+
+    def __init__(self, directory, basename, formats):
+        self.paths = []
+        self._rows = []
+        self._csv_file = self._csv = self._parquet = None
+        if 'csv' in formats:
+            path = os.path.join(directory, f'{basename}.csv')
+            self._csv_file = open(path, 'w', newline='', buffering=1 << 16)
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow([name for name, _ in EXPORT_COLUMNS])
+            self.paths.append(path)
+        if 'parquet' in formats:
+            path = os.path.join(directory, f'{basename}.parquet')
+            self._schema = _arrow_schema()
+            self._parquet = pq.ParquetWriter(path, self._schema, compression='snappy')
+            self.paths.append(path)
+
+    def add(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= EXPORT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self._csv is not None:
+            self._csv.writerows(self._rows)
+        if self._parquet is not None:
+            columns = list(zip(*self._rows))
+            self._parquet.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, self._schema)],
+                schema=self._schema
+            ))
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def export_reservations(directory, basename, start=None, end=None, formats=('csv',), split_by_month=False):
+    """Write the export files and return their paths"""
+    formats = [f for f in formats if f in EXPORT_FORMATS]
+    if not formats:
+        raise ValueError(f"Export formats must be among {', '.join(EXPORT_FORMATS)}")
+    if 'parquet' in formats and pa is None:
+        raise ValueError("Parquet export needs pyarrow installed")
+
+    # Rows come in parking time order when splitting, so each month's part is
+    # finished before the next opens and only one writer is alive at a time
+    paths = []
+    writer = part = None
+    try:
+        for row in export_rows(start, end, by_time=split_by_month):
+            row_part = row[4].strftime('%Y-%m') if split_by_month else None
+            if writer is None or row_part != part:
+                if writer is not None:
+                    writer.close()
+                part = row_part
+                writer = _PartWriter(directory, f'{basename}_{part}' if part else basename, formats)
+                paths.extend(writer.paths)
+            writer.add(tuple(row))
+        if writer is None:
+            # Keep an empty file with headers rather than an empty archive
+            writer = _PartWriter(directory, basename, formats)
+            paths.extend(writer.paths)
+    finally:
+        if writer is not None:
+            writer.close()
+    return paths
+
+def zip_files(paths, zip_path):
+    """Bundle export parts into one archive and remove the loose files"""
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, arcname=os.path.basename(path))
+    for path in paths:
+        os.remove(path)
+    return zip_path
+
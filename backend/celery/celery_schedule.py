@@ -1,5 +1,6 @@
 from celery.schedules import crontab
-from backend.celery.tasks import send_daily_reminders, send_monthly_activity_reports
+from backend.celery.tasks import send_daily_reminders, send_monthly_activity_reports, cleanup_exports, refresh_admin_summary
+from backend.occupancy_history import SAMPLE_INTERVAL
 
 def setup_periodic_tasks(celery_app):
     celery_app.conf.beat_schedule = {
@@ -11,4 +12,20 @@ def setup_periodic_tasks(celery_app):
             'task': 'backend.celery.tasks.send_monthly_activity_reports',
             'schedule': crontab(hour=18, minute=30, day_of_month=1),
         },
+        'cleanup-exports': {
+            'task': 'backend.celery.tasks.cleanup_exports',
+            'schedule': crontab(minute=15),
+        },
+        'refresh-admin-summary': {
+            'task': 'backend.celery.tasks.refresh_admin_summary',
+            'schedule': 60.0,
+        },
+        'record-occupancy-sample': {
+            'task': 'backend.celery.tasks.record_occupancy_sample',
+            'schedule': float(SAMPLE_INTERVAL),
+        },
+        'downsample-occupancy': {
+            'task': 'backend.celery.tasks.downsample_occupancy',
+            'schedule': crontab(minute=5),
+        },
     }
\ No newline at end of file
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import time
+from sqlalchemy import func
+from backend.models import db, Reservation
+
+# Export files named after a fingerprint of what they contain: an unchanged
+# reservation history maps to the file already on disk. Files expire after a
+# TTL and the oldest go first when the directory grows past its cap.
+
+EXPORT_DIR = './backend/celery/user-downloads'
+
+
+def ensure_export_dir():
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return EXPORT_DIR
+
+
+def export_path(filename):
+    # Filenames come back from task results and URLs; never leave EXPORT_DIR
+    return os.path.join(EXPORT_DIR, os.path.basename(filename))
+
+
+def user_export_fingerprint(user_id):
+    """Changes whenever a reservation is added, released or re-priced"""
+    count, max_id, last_left, total_cost = db.session.query(
+        func.count(Reservation.id),
+        func.max(Reservation.id),
+        func.max(Reservation.leaving_timestamp),
+        func.sum(Reservation.parking_cost)
+    ).filter(Reservation.user_id == user_id).one()
+    key = f'{user_id}:{count}:{max_id}:{last_left}:{total_cost}'
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def user_export_filename(user_id, compress=False):
+    return f'user_parking_{user_id}_{user_export_fingerprint(user_id)}.csv' + ('.gz' if compress else '')
+
+
+def find_export(filename):
+    """Path of an existing export, refreshed so eviction treats it as recently used"""
+    path = export_path(filename)
+    if not os.path.exists(path):
+        return None
+    os.utime(path)
+    return path
+
+
+def cleanup_exports(ttl_seconds, max_bytes):
+    """Delete exports older than the TTL, then the oldest until the directory fits max_bytes"""
+    if not os.path.isdir(EXPORT_DIR):
+        return 0, 0
+    now = time.time()
+    files = []
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    removed = freed = 0
+    kept = []
+    for mtime, size, path in files:
+        if now - mtime > ttl_seconds:
+            removed, freed = _remove(path, size, removed, freed)
+        else:
+            kept.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in kept)
+    for mtime, size, path in sorted(kept):
+        if total <= max_bytes:
+            break
+        removed, freed = _remove(path, size, removed, freed)
+        total -= size
+    return removed, freed
+
+
+def _remove(path, size, removed, freed):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return removed, freed
+    return removed + 1, freed + size
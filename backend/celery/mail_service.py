@@ -11,10 +11,131 @@ SMTP_PORT = 1025
 SENDER_EMAIL = 'admin@gmail.com'
 SENDER_PASSWORD = 'admin'
 
+# Servers such as SES or Gmail close a session after a number of messages,
+# so long batches reconnect before reaching it
+MAX_MESSAGES_PER_CONNECTION = 100
+
+
+def _build_message(to, subject, content):
+    msg = MIMEMultipart()
+    msg['To'] = to
+    msg['From'] = SENDER_EMAIL
+    msg['Subject'] = subject
+
+    # Attach content as HTML
+    msg.attach(MIMEText(content, 'html'))
+    return msg
+
+
+class Mailer:
+    """
+    Reusable SMTP session for sending many messages over one connection
+
+    Connects lazily, reconnects after MAX_MESSAGES_PER_CONNECTION messages and
+    retries a message once on a fresh connection if the server dropped the old one.
+
+    Usage:
+        with Mailer() as mailer:
+            for user in users:
+                mailer.send(user.email, subject, content)
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, max_messages=MAX_MESSAGES_PER_CONNECTION, retries=1):
+        self.host = host
+        self.port = port
+        self.max_messages = max_messages
+        self.retries = retries
+        self.sent_count = 0
+        self.connection_count = 0
+        self._client = None
+        self._sent_on_connection = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        self.close()
+        self._client = smtplib.SMTP(host=self.host, port=self.port)
+        self._sent_on_connection = 0
+        self.connection_count += 1
+
+    def send(self, to, subject, content):
+        """Send one message, returning True if the server accepted it"""
+        msg = _build_message(to, subject, content)
+        for attempt in range(self.retries + 1):
+            try:
+                if self._client is None or self._sent_on_connection >= self.max_messages:
+                    self._connect()
+                self._client.send_message(msg)
+                self._sent_on_connection += 1
+                self.sent_count += 1
+                logger.info(f"Email sent successfully to {to}")
+                return True
+            except smtplib.SMTPServerDisconnected as e:
+                # Connection-level failure: drop the session and retry on a new one
+                logger.warning(f"SMTP connection lost while sending to {to}: {str(e)}")
+                self._discard()
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code == 421:
+                    # Server is closing the session (often a per-connection limit)
+                    self._discard()
+                    continue
+                logger.error(f"SMTP error when sending email to {to}: {str(e)}")
+                return False
+            except smtplib.SMTPException as e:
+                # Refused recipients and the like: the session is still usable
+                logger.error(f"SMTP error when sending email to {to}: {str(e)}")
+                return False
+            except OSError as e:
+                # SMTPException subclasses OSError, so socket errors are caught last
+                logger.warning(f"SMTP connection lost while sending to {to}: {str(e)}")
+                self._discard()
+        logger.error(f"Giving up on email to {to} after {self.retries + 1} attempts")
+        return False
+
+    def close(self):
+        if self._client is not None:
+            try:
+                self._client.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._client = None
+
+    def _discard(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except OSError:
+                pass
+            self._client = None
+
+
+def send_many(messages, **mailer_options):
+    """
+    Send (to, subject, content) messages over pooled SMTP connections
+
+    Returns:
+        int: Number of messages the server accepted
+    """
+    with Mailer(**mailer_options) as mailer:
+        for to, subject, content in messages:
+            # One malformed message must not cost the rest of the batch
+            try:
+                mailer.send(to, subject, content)
+            except Exception as e:
+                logger.error(f"Failed to send email to {to}: {str(e)}")
+        return mailer.sent_count
+
+
 def send_email(to, subject, content):
     """
     Send email via SMTP server (MailHog for development)
 
+    Opens a connection for this one message; use Mailer or send_many for batches.
+
     Args:
         to (str): Recipient email address
         subject (str): Email subject
@@ -24,25 +145,8 @@ def send_email(to, subject, content):
         bool: True if email sent successfully, False otherwise
     """
     try:
-        msg = MIMEMultipart()
-        msg['To'] = to
-        msg['From'] = SENDER_EMAIL
-        msg['Subject'] = subject
-
-        # Attach content as HTML
-        msg.attach(MIMEText(content, 'html'))
-
-        # Connect to SMTP server and send email
-        with smtplib.SMTP(host=SMTP_SERVER, port=SMTP_PORT) as client:
-            
-            client.send_message(msg)
-
-        logger.info(f"Email sent successfully to {to}")
-        return True
-
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP error when sending email to {to}: {str(e)}")
-        return False
+        with Mailer() as mailer:
+            return mailer.send(to, subject, content)
     except Exception as e:
         logger.error(f"Unexpected error when sending email to {to}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+# Monthly reports rendered straight from a Jinja environment built once per
+# worker process, without Flask's render_template and its per-call context setup
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'frontend')
+TEMPLATE_NAME = 'monthly_report.html'
+
+_template = None
+_pool = None
+_pool_size = 0
+
+
+def get_template():
+    """The compiled report template, loaded on first use and kept for the life of the process"""
+    global _template
+    if _template is None:
+        env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(['html', 'htm', 'xml']),
+            auto_reload=False
+        )
+        _template = env.get_template(TEMPLATE_NAME)
+    return _template
+
+
+def render_report(month_name, report):
+    return get_template().render(
+        user_name=report['user_name'],
+        month_name=month_name,
+        total_bookings=report['total_bookings'],
+        total_amount=report['total_amount'],
+        most_used_lot=report['most_used_lot'],
+        bookings=report['bookings']
+    )
+
+
+def render_reports(month_name, reports, processes=0):
+    """Render a batch of reports in order.
+
+    With processes > 1 the batch is spread over a process pool kept for the
+    life of the worker. Prefork Celery workers are daemonic and cannot start
+    child processes, so only enable this under the threads or solo pool.
+    """
+    if processes <= 1 or len(reports) < 2:
+        return [render_report(month_name, report) for report in reports]
+    pool = _get_pool(processes)
+    chunksize = max(1, len(reports) // (processes * 4))
+    return list(pool.map(partial(render_report, month_name), reports, chunksize=chunksize))
+
+
+def _get_pool(processes):
+    global _pool, _pool_size
+    if _pool is None or _pool_size != processes:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=processes)
+        _pool_size = processes
+    return _pool
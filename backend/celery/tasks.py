@@ -1,38 +1,138 @@
-from celery import shared_task
-from flask import render_template
-from backend.models import Reservation, ParkingSpot, ParkingLot, db, User
+from celery import shared_task, group, chord
+from flask import current_app
+from backend.models import db, User
 import csv
+import gzip
 import os
 from datetime import datetime, timedelta
 import flask_excel
-from backend.celery.mail_service import send_email
+from backend.celery.mail_service import Mailer, send_many
+from backend.celery.report_renderer import render_reports
+from backend.celery.bulk_export import export_reservations, zip_files
+from backend.celery.export_store import ensure_export_dir, export_path, find_export, user_export_filename
+from backend.celery.export_store import cleanup_exports as cleanup_export_files
+from backend.extensions import cache
+from backend.queries import user_export_rows, non_admin_users, users_without_booking
+from backend.monthly_activity import iter_monthly_activity
+from backend.admin_summary import refresh_snapshot as refresh_admin_snapshot
+from backend.occupancy_history import record_sample, downsample
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CSV_WRITE_BUFFER = 1 << 16
+
+
 @shared_task(bind=True, ignore_result=False)
-def create_user_csv(self, user_id):
-    reservations = Reservation.query.filter_by(user_id=user_id).all()
-    task_id = self.request.id
-    filename = f'user_parking_{user_id}_{task_id}.csv'
-    filepath = f'./backend/celery/user-downloads/{filename}'
+def create_user_csv(self, user_id, compress=False):
+    filename = user_export_filename(user_id, compress)
+    if find_export(filename):
+        return filename
+
+    # Written under a temporary name so a concurrent download never sees half a file
+    ensure_export_dir()
+    filepath = export_path(filename)
+    tmp_path = f'{filepath}.{self.request.id}.tmp'
 
-    with open(filepath, 'w', newline='') as csvfile:
+    # Rows stream from the database and through a buffered writer, so memory
+    # stays flat however long the history is
+    if compress:
+        csvfile = gzip.open(tmp_path, 'wt', newline='', compresslevel=6)
+    else:
+        csvfile = open(tmp_path, 'w', newline='', buffering=CSV_WRITE_BUFFER)
+    with csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['slot_id', 'spot_id', 'parking_timestamp', 'leaving_timestamp', 'parking_cost', 'vehicle_number'])
-        for r in reservations:
+        for lot_id, spot_id, parked, left, cost, vehicle in user_export_rows(user_id):
             writer.writerow([
-                r.spot.lot_id if r.spot else '',
-                r.spot_id,
-                r.parking_timestamp,
-                r.leaving_timestamp,
-                r.parking_cost,
-                r.vehicle_number
+                lot_id if lot_id is not None else '',
+                spot_id,
+                parked,
+                left,
+                cost,
+                vehicle
             ])
+    os.replace(tmp_path, filepath)
     return filename
 
+def export_range(start=None, end=None):
+    """Parse ISO start/end strings; a date-only end includes that whole day"""
+    start_at = datetime.fromisoformat(start) if start else None
+    end_at = None
+    if end:
+        end_at = datetime.fromisoformat(end)
+        if len(end) == 10:
+            end_at += timedelta(days=1)
+    return start_at, end_at
+
+
+@shared_task(bind=True, ignore_result=False)
+def create_reservations_export(self, start=None, end=None, formats=('csv',), split_by_month=False):
+    """Admin export of every reservation in a date range; several parts are zipped together"""
+    task_id = self.request.id
+    directory = ensure_export_dir()
+    basename = f'reservations_{task_id}'
+    start_at, end_at = export_range(start, end)
+    paths = export_reservations(directory, basename, start_at, end_at,
+                                formats=formats, split_by_month=split_by_month)
+    logger.info(f"Reservation export {task_id} wrote {len(paths)} files")
+    if len(paths) == 1:
+        return os.path.basename(paths[0])
+    return os.path.basename(zip_files(paths, os.path.join(directory, f'{basename}.zip')))
+
+
+@shared_task(bind=True, ignore_result=False)
+def cleanup_exports(self):
+    removed, freed = cleanup_export_files(
+        current_app.config.get('EXPORT_TTL_SECONDS', 24 * 3600),
+        current_app.config.get('EXPORT_DISK_CAP_BYTES', 500 * 1024 * 1024)
+    )
+    logger.info(f"Export cleanup removed {removed} files ({freed} bytes)")
+    return f"Removed {removed} export files"
+
+
+@shared_task(bind=True, ignore_result=True)
+def refresh_admin_summary(self):
+    payload = refresh_admin_snapshot()
+    db.session.commit()
+    return payload['totalSessions']
+
+
+@shared_task(bind=True, ignore_result=True)
+def record_occupancy_sample(self):
+    row_count = record_sample()
+    db.session.commit()
+    return row_count
+
+
+@shared_task(bind=True, ignore_result=True)
+def downsample_occupancy(self):
+    folded = downsample()
+    db.session.commit()
+    logger.info(f"Folded {folded} occupancy samples into coarser buckets")
+    return folded
+
+
+REMINDER_BATCH_SIZE = 500
+
+
+def _reminder_content(full_name, day):
+    return f"""
+    <html>
+    <body>
+        <h2>Parking Reminder</h2>
+        <p>Hi {full_name},</p>
+        <p>You don't have a parking spot booked for {day.strftime('%B %d, %Y')}.</p>
+        <p>If you need any parking spots, please visit our parking portal to make your reservation.</p>
+        <br>
+        <p>Best regards,<br>ParkEZ Team</p>
+    </body>
+    </html>
+    """
+
+
 @shared_task(bind=True, ignore_result=False)
 def send_daily_reminders(self):
     logger.info("Starting daily reminder task")
@@ -40,142 +140,203 @@ def send_daily_reminders(self):
     actual_today = current_datetime.date()  
     logger.info(f"Task running at: {current_datetime}")
     logger.info(f"Checking for bookings on: {actual_today}")
-    
-    users = [u for u in User.query.all() if not any(role.name == 'admin' for role in u.roles)]
-    reminder_count = 0
-    
-    for user in users:
-        has_today_booking = Reservation.query.filter(
-            Reservation.user_id == user.id,
-            Reservation.parking_timestamp >= datetime.combine(actual_today, datetime.min.time()),
-            Reservation.parking_timestamp <= datetime.combine(actual_today, datetime.max.time())
-        ).first()
-        
-        # Send reminder only if user DOESN'T have booking for actual today
-        if not has_today_booking:
-            try:
-                subject = "Daily Parking Reminder"
-                content = f"""
-                <html>
-                <body>
-                    <h2>Parking Reminder</h2>
-                    <p>Hi {user.full_name},</p>
-                    <p>You don't have a parking spot booked for {actual_today.strftime('%B %d, %Y')}.</p>
-                    <p>If you need any parking spots, please visit our parking portal to make your reservation.</p>
-                    <br>
-                    <p>Best regards,<br>ParkEZ Team</p>
-                </body>
-                </html>
-                """
-                send_email(user.email, subject, content)
-                reminder_count += 1
-                logger.info(f"Sent reminder to {user.email} - no booking for {actual_today}")
-            except Exception as e:
-                logger.error(f"Failed to send reminder to {user.email}: {str(e)}")
-        else:
-            logger.info(f"Skipped {user.email} - already has booking for {actual_today}")
-    
-    logger.info(f"Daily reminder task completed. Sent {reminder_count} reminders for {actual_today}.")
-    return f"Sent {reminder_count} reminders for {actual_today}"
+
+    day_start = datetime.combine(actual_today, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+
+    # One anti-join streamed in chunks; each full chunk goes out as its own send task
+    batch = []
+    queued_count = 0
+    batch_count = 0
+    for user_id, email, full_name in users_without_booking(day_start, day_end).yield_per(REMINDER_BATCH_SIZE):
+        batch.append((email, full_name))
+        if len(batch) >= REMINDER_BATCH_SIZE:
+            send_reminder_batch.delay(batch, actual_today.isoformat())
+            queued_count += len(batch)
+            batch_count += 1
+            batch = []
+    if batch:
+        send_reminder_batch.delay(batch, actual_today.isoformat())
+        queued_count += len(batch)
+        batch_count += 1
+
+    logger.info(f"Daily reminder task completed. Queued {queued_count} reminders in {batch_count} batches for {actual_today}.")
+    return f"Queued {queued_count} reminders for {actual_today}"
 
 @shared_task(bind=True, ignore_result=False)
-def send_monthly_activity_reports(self):
-    logger.info("Starting monthly activity report task")
-    today = datetime.now().date()
-    # Calculate previous month and year
+def send_reminder_batch(self, recipients, day):
+    """Send the daily reminder to a batch of (email, full_name) pairs"""
+    day = datetime.fromisoformat(day).date()
+    subject = "Daily Parking Reminder"
+    sent_count = send_many(
+        (email, subject, _reminder_content(full_name, day)) for email, full_name in recipients
+    )
+    logger.info(f"Sent {sent_count} of {len(recipients)} reminders for {day}")
+    return sent_count
+
+MONTHLY_REPORT_CHUNK_SIZE = 1000
+REPORT_RENDER_BATCH_SIZE = 100
+# Progress and resume markers outlive any retry of the month's run
+MONTHLY_REPORT_STATE_TIMEOUT = 7 * 24 * 3600
+
+
+def _previous_month(today):
     if today.month == 1:
-        previous_month = 12
-        year = today.year - 1
-    else:
-        previous_month = today.month - 1
-        year = today.year
-    # Start date of previous month
-    month_start = datetime(year, previous_month, 1).date()
-    # End date of previous month
-    if previous_month == 12:
-        month_end = datetime(year + 1, 1, 1).date() - timedelta(days=1)
+        return datetime(today.year - 1, 12, 1).date()
+    return datetime(today.year, today.month - 1, 1).date()
+
+
+def _month_bounds(month_key):
+    month_start = datetime.strptime(month_key, '%Y-%m').date()
+    if month_start.month == 12:
+        month_end = datetime(month_start.year + 1, 1, 1).date() - timedelta(days=1)
     else:
-        month_end = datetime(year, previous_month + 1, 1).date() - timedelta(days=1)
+        month_end = datetime(month_start.year, month_start.month + 1, 1).date() - timedelta(days=1)
+    return month_start, month_end
 
-    month_name = month_start.strftime('%B %Y')
-    # current month
-    # today = datetime.now().date()
-    # year = today.year
-    # month = today.month
-
-    # month_start = datetime(year, month, 1).date()
-    # if month == 12:
-    #     month_end = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-    # else:
-    #     month_end = datetime(year, month + 1, 1).date() - timedelta(days=1)
-
-    # month_name = month_start.strftime('%B %Y')
-    logger.info(f"Generating reports for previous month: {month_name}")
+
+def _report_key(month_key, name):
+    return f'monthly-report:{month_key}:{name}'
+
+
+def monthly_report_progress(month_key):
+    """Chunks finished and reports sent so far for a month's run"""
+    total_chunks = cache.get(_report_key(month_key, 'total_chunks'))
+    if total_chunks is None:
+        return None
+    return {
+        'month': month_key,
+        'total_chunks': total_chunks,
+        'done_chunks': cache.get(_report_key(month_key, 'done_chunks')) or 0,
+        'sent': cache.get(_report_key(month_key, 'sent')) or 0,
+        'finished': bool(cache.get(_report_key(month_key, 'finished'))),
+        'failed': bool(cache.get(_report_key(month_key, 'failed')))
+    }
+
+
+def _user_id_ranges(chunk_size):
+    """Consecutive (first_id, last_id) ranges of at most chunk_size non-admin users"""
+    ranges = []
+    first_id = last_id = None
+    count = 0
+    for (user_id,) in non_admin_users().with_entities(User.id).yield_per(chunk_size):
+        if first_id is None:
+            first_id = user_id
+        last_id = user_id
+        count += 1
+        if count == chunk_size:
+            ranges.append((first_id, last_id))
+            first_id = None
+            count = 0
+    if first_id is not None:
+        ranges.append((first_id, last_id))
+    return ranges
+
+
+@shared_task(bind=True, ignore_result=False)
+def send_monthly_activity_reports(self, month_key=None):
+    """Split the previous month's reports into user-id ranges and fan them out as a chord"""
+    logger.info("Starting monthly activity report task")
+    month_key = month_key or _previous_month(datetime.now().date()).strftime('%Y-%m')
+    month_start, month_end = _month_bounds(month_key)
+    logger.info(f"Generating reports for previous month: {month_start.strftime('%B %Y')}")
     logger.info(f"Date range: {month_start} to {month_end}")
-    
-    users = [u for u in User.query.all() if not any(role.name == 'admin' for role in u.roles)]
+
+    # A rerun of the same month reuses the first run's ranges, so chunk keys still
+    # match after users are deleted or change role, and skips finished chunks
+    timeout = MONTHLY_REPORT_STATE_TIMEOUT
+    ranges_key = _report_key(month_key, 'ranges')
+    ranges = cache.get(ranges_key)
+    if ranges is None:
+        ranges = _user_id_ranges(MONTHLY_REPORT_CHUNK_SIZE)
+        if not ranges:
+            return f"No users to report on for {month_key}"
+        cache.set(ranges_key, ranges, timeout=timeout)
+
+    cache.set(_report_key(month_key, 'total_chunks'), len(ranges), timeout=timeout)
+    cache.add(_report_key(month_key, 'done_chunks'), 0, timeout=timeout)
+    cache.add(_report_key(month_key, 'sent'), 0, timeout=timeout)
+    cache.delete(_report_key(month_key, 'finished'))
+    cache.delete(_report_key(month_key, 'failed'))
+
+    header = group(send_monthly_report_chunk.s(month_key, first_id, last_id) for first_id, last_id in ranges)
+    callback = summarize_monthly_reports.s(month_key)
+    # A chunk that fails for good skips the callback, so mark the run failed instead
+    callback.link_error(mark_monthly_reports_failed.s(month_key))
+    result = chord(header)(callback)
+    logger.info(f"Queued {len(ranges)} monthly report chunks for {month_key}")
+    return {'month': month_key, 'chunks': len(ranges), 'summary_task_id': result.id}
+
+
+@shared_task(bind=True, ignore_result=False, autoretry_for=(Exception,), max_retries=3, retry_backoff=True)
+def send_monthly_report_chunk(self, month_key, first_id, last_id):
+    """Send monthly reports to the non-admin users with ids in [first_id, last_id]"""
+    chunk_key = _report_key(month_key, f'chunk:{first_id}-{last_id}')
+    done = cache.get(chunk_key)
+    if done is not None:
+        logger.info(f"Skipping monthly report chunk {first_id}-{last_id} for {month_key}, already sent")
+        return done
+
+    # Users already mailed by an earlier attempt of this chunk are skipped
+    cursor_key = f'{chunk_key}:last_user'
+    resume_after = cache.get(cursor_key) or first_id - 1
+    month_start, month_end = _month_bounds(month_key)
+    month_name = month_start.strftime('%B %Y')
+    # Every user's totals, most used lot and booking lines come from one streamed query;
+    # users without bookings that month are not in it
+    activity = iter_monthly_activity(
+        datetime.combine(month_start, datetime.min.time()),
+        datetime.combine(month_end + timedelta(days=1), datetime.min.time()),
+        first_id=resume_after + 1,
+        last_id=last_id
+    )
+
+    processes = current_app.config.get('MONTHLY_REPORT_RENDER_PROCESSES', 0)
     report_count = 0
-    
-    for user in users:
+    with Mailer() as mailer:
+        batch = []
+        for report in activity:
+            batch.append(report)
+            if len(batch) >= REPORT_RENDER_BATCH_SIZE:
+                report_count += _send_monthly_reports(mailer, batch, month_name, processes, cursor_key)
+                batch = []
+        if batch:
+            report_count += _send_monthly_reports(mailer, batch, month_name, processes, cursor_key)
+
+    cache.set(chunk_key, report_count, timeout=MONTHLY_REPORT_STATE_TIMEOUT)
+    cache.cache.inc(_report_key(month_key, 'done_chunks'))
+    cache.cache.inc(_report_key(month_key, 'sent'), report_count)
+    progress = monthly_report_progress(month_key)
+    if progress:
+        logger.info(f"Monthly reports for {month_key}: {progress['done_chunks']}/{progress['total_chunks']} chunks, {progress['sent']} sent")
+    return report_count
+
+
+@shared_task(bind=True, ignore_result=False)
+def summarize_monthly_reports(self, chunk_counts, month_key):
+    report_count = sum(chunk_counts)
+    cache.set(_report_key(month_key, 'finished'), True, timeout=MONTHLY_REPORT_STATE_TIMEOUT)
+    logger.info(f"Monthly report task completed. Sent {report_count} reports for {month_key} in {len(chunk_counts)} chunks.")
+    return f"Sent {report_count} monthly reports for {month_key}"
+
+
+@shared_task(ignore_result=True)
+def mark_monthly_reports_failed(request, exc, traceback, month_key):
+    """Chord error callback: record that the month's run stopped on a failed chunk"""
+    cache.set(_report_key(month_key, 'failed'), True, timeout=MONTHLY_REPORT_STATE_TIMEOUT)
+    logger.error(f"Monthly reports for {month_key} failed in task {request.id}: {exc}")
+
+
+def _send_monthly_reports(mailer, reports, month_name, processes, cursor_key):
+    """Render a batch of reports with the precompiled template and mail them; returns the number sent"""
+    subject = f"Your Monthly Parking Activity Report ({month_name})"
+    sent_count = 0
+    for report, html in zip(reports, render_reports(month_name, reports, processes)):
         try:
-            # Get all reservations for previous month
-            reservations = Reservation.query.filter(
-                Reservation.user_id == user.id,
-                Reservation.parking_timestamp >= datetime.combine(month_start, datetime.min.time()),
-                Reservation.parking_timestamp <= datetime.combine(month_end, datetime.max.time())
-            ).all()
-
-            # Only send report if user had any activity
-            if not reservations:
-                logger.info(f"Skipped {user.email} - no activity in {month_name}")
-                continue
-   
-            total_bookings = len(reservations)
-            total_amount = sum(r.parking_cost or 0 for r in reservations)
-
-            # Most used parking lot
-            lot_counts = {}
-            for r in reservations:
-                if r.spot and r.spot.lot_id:
-                    lot_id = r.spot.lot_id
-                    lot_counts[lot_id] = lot_counts.get(lot_id, 0) + 1
-            
-            most_used_lot = "N/A"
-            if lot_counts:
-                most_used_lot_id = max(lot_counts, key=lot_counts.get)
-                lot = ParkingLot.query.get(most_used_lot_id)
-                most_used_lot = lot.prime_location_name if lot else "Unknown"
-
-            # Prepare booking details for the template
-            bookings = []
-            for r in reservations:
-                bookings.append({
-                    "id": r.id,
-                    "lot_name": r.spot.lot.prime_location_name if r.spot and r.spot.lot else "N/A",
-                    "spot_id": r.spot_id or "N/A",
-                    "date": r.parking_timestamp.strftime('%Y-%m-%d'),
-                    "cost": r.parking_cost or 0
-                })
-
-            # Render HTML using your template
-            html = render_template('monthly_report.html', 
-                                 user_name=user.full_name,
-                                 month_name=month_name,
-                                 total_bookings=total_bookings,
-                                 total_amount=total_amount,
-                                 most_used_lot=most_used_lot,
-                                 bookings=bookings)
-
-            # Send email with rendered HTML
-            subject = f"Your Monthly Parking Activity Report ({month_name})"
-            send_email(user.email, subject, html)
-            
-            report_count += 1
-            logger.info(f"Sent monthly report to {user.email} for {month_name}")
-            
+            if mailer.send(report['email'], subject, html):
+                sent_count += 1
+                logger.info(f"Sent monthly report to {report['email']} for {month_name}")
         except Exception as e:
-            logger.error(f"Failed to send monthly report to {user.email}: {str(e)}")
-            continue  # Continue with next user even if one fails
-    
-    logger.info(f"Monthly report task completed. Sent {report_count} reports for {month_name}.")
-    return f"Sent {report_count} monthly reports for {month_name}"
\ No newline at end of file
+            logger.error(f"Failed to send monthly report to {report['email']}: {str(e)}")
+        cache.set(cursor_key, report['user_id'], timeout=MONTHLY_REPORT_STATE_TIMEOUT)
+    return sent_count
@@ -17,4 +17,25 @@ class LocalDevelopmentConfig(Config):
     #cache specific
     CACHE_TYPE = 'RedisCache'
     CACHE_DEFAULT_TIMEOUT = 30
-    CACHE_REDIS_PORT = 6379
\ No newline at end of file
+    CACHE_REDIS_PORT = 6379
+
+    #free-spot index: memory (per process) or redis (shared)
+    SPOT_INDEX_BACKEND = 'memory'
+
+    #token -> user cache in front of the database
+    AUTH_CACHE_TTL = 300
+    AUTH_CACHE_LOCAL_TTL = 5
+    AUTH_CACHE_SIZE = 10000
+
+    #user summary from per-day rollups (False = rescan reservations)
+    USER_SUMMARY_FROM_ROLLUPS = True
+
+    #process pool for rendering monthly reports (0 = render in the task; needs a non-prefork worker)
+    MONTHLY_REPORT_RENDER_PROCESSES = 0
+
+    #user-downloads lifetime and disk cap, enforced by the cleanup-exports beat task
+    EXPORT_TTL_SECONDS = 24 * 3600
+    EXPORT_DISK_CAP_BYTES = 500 * 1024 * 1024
+
+    #admin summary totals snapshot (refreshed every minute by beat); older than this, a request recomputes it
+    ADMIN_SUMMARY_MAX_AGE = 300
\ No newline at end of file
@@ -1,3 +1,7 @@
 from flask_caching import Cache
+from .spot_index import SpotIndex
+from .auth_cache import TokenCache
 
-cache = Cache()
\ No newline at end of file
+cache = Cache()
+spot_index = SpotIndex()
+token_cache = TokenCache()
@@ -0,0 +1,97 @@
+import math
+from sqlalchemy import text, func, column, table
+from .models import db, ParkingLot, LotOccupancy
+
+# Nearest-lot lookup over the parking_lot_rtree index (migration 5). A bounding
+# box around the location is widened until it holds k lots with free spots, so
+# only lots near the caller are read. Databases without the index fall back
+# to a range filter on the coordinate columns.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+START_RADIUS_KM = 2.0
+MAX_RADIUS_KM = 200.0
+MAX_RESULTS = 50
+
+lot_rtree = table(
+    'parking_lot_rtree',
+    column('id'), column('min_lat'), column('max_lat'), column('min_lng'), column('max_lng')
+)
+
+
+def parse_coordinates(latitude, longitude):
+    """(lat, lng) as floats, or (None, None) when both are blank; raises ValueError otherwise"""
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    lat, lng = float(latitude), float(longitude)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('Coordinates out of range')
+    return lat, lng
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearest_lots(latitude, longitude, k=10, max_radius_km=MAX_RADIUS_KM):
+    """Up to k (lot, available_spots, distance_km) with free spots, nearest first"""
+    k = max(1, min(k, MAX_RESULTS))
+    radius = START_RADIUS_KM
+    while True:
+        radius = min(radius, max_radius_km)
+        found = []
+        for lot, available in _lots_in_box(latitude, longitude, radius):
+            distance = distance_km(latitude, longitude, lot.latitude, lot.longitude)
+            # Box corners reach past the radius; lots there may not be the nearest
+            if distance <= radius:
+                found.append((lot, available, distance))
+        if len(found) >= k or radius >= max_radius_km:
+            found.sort(key=lambda item: (item[2], item[0].id))
+            return found[:k]
+        radius *= 2
+
+
+def pincode_centroid(pincode):
+    """Mean coordinates of the lots in a pincode, or None when none have coordinates"""
+    lat, lng = db.session.query(func.avg(ParkingLot.latitude), func.avg(ParkingLot.longitude))\
+        .filter(ParkingLot.pincode == pincode,
+                ParkingLot.latitude.isnot(None), ParkingLot.longitude.isnot(None)).one()
+    return None if lat is None else (lat, lng)
+
+
+def _lots_in_box(latitude, longitude, radius_km):
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    d_lng = min(180.0, radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 1e-6)))
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    min_lng, max_lng = longitude - d_lng, longitude + d_lng
+
+    query = db.session.query(ParkingLot, LotOccupancy.available_spots)\
+        .join(LotOccupancy, LotOccupancy.lot_id == ParkingLot.id)\
+        .filter(LotOccupancy.available_spots > 0)
+    if _rtree_available():
+        query = query.join(lot_rtree, lot_rtree.c.id == ParkingLot.id).filter(
+            lot_rtree.c.max_lat >= min_lat, lot_rtree.c.min_lat <= max_lat,
+            lot_rtree.c.max_lng >= min_lng, lot_rtree.c.min_lng <= max_lng
+        )
+    else:
+        query = query.filter(
+            ParkingLot.latitude.between(min_lat, max_lat),
+            ParkingLot.longitude.between(min_lng, max_lng)
+        )
+    return query.all()
+
+
+_rtree_by_database = {}
+
+
+def _rtree_available():
+    database = str(db.engine.url)
+    if database not in _rtree_by_database:
+        _rtree_by_database[database] = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'parking_lot_rtree'"
+        )).first() is not None
+    return _rtree_by_database[database]
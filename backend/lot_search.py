@@ -0,0 +1,90 @@
+from sqlalchemy import text
+from .models import db, ParkingLot
+
+# Lot search backed by the parking_lot_fts trigram index (migration 4). Trigrams
+# need at least three characters, so shorter queries fall back to ILIKE, as
+# does a database without the index.
+
+SEARCH_COLUMNS = {
+    'name': 'prime_location_name',
+    'address': 'address',
+    'pincode': 'pincode',
+}
+# bm25 weights in column order: a hit in the name outranks one in the address
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+MIN_TRIGRAM_LENGTH = 3
+MAX_RESULTS = 100
+
+
+def search_lots(query, search_type='all', limit=50, offset=0):
+    """Lots matching query as a substring, exact pincode hits first, then best matches"""
+    limit = max(1, min(limit, MAX_RESULTS))
+    offset = max(0, offset)
+    if not query:
+        return ParkingLot.query.order_by(ParkingLot.id).limit(limit).offset(offset).all()
+
+    exact_ids = []
+    if search_type in ('all', 'pincode') and query.isdigit():
+        exact_ids = [lot_id for (lot_id,) in db.session.query(ParkingLot.id)
+                     .filter(ParkingLot.pincode == query).order_by(ParkingLot.id)]
+
+    # Exact hits lead and substring matches follow, paginated as one list
+    window = offset + limit + len(exact_ids)
+    if len(query) < MIN_TRIGRAM_LENGTH or not _fts_available():
+        matched = _ilike_ids(query, search_type, window)
+    else:
+        matched = _fts_ids(query, search_type, window)
+    exact = set(exact_ids)
+    ids = exact_ids + [lot_id for lot_id in matched if lot_id not in exact]
+    return _load(ids[offset:offset + limit])
+
+
+def _load(ids):
+    lots = {lot.id: lot for lot in ParkingLot.query.filter(ParkingLot.id.in_(ids))} if ids else {}
+    return [lots[lot_id] for lot_id in ids if lot_id in lots]
+
+
+def _fts_ids(query, search_type, limit):
+    phrase = '"' + query.replace('"', '""') + '"'
+    column = SEARCH_COLUMNS.get(search_type)
+    match = f'{column} : {phrase}' if column else phrase
+    return [row[0] for row in db.session.execute(
+        text(
+            'SELECT rowid FROM parking_lot_fts WHERE parking_lot_fts MATCH :match '
+            'ORDER BY bm25(parking_lot_fts, :w_name, :w_address, :w_pincode) '
+            'LIMIT :limit'
+        ),
+        {
+            'match': match,
+            'w_name': RANK_WEIGHTS[0],
+            'w_address': RANK_WEIGHTS[1],
+            'w_pincode': RANK_WEIGHTS[2],
+            'limit': limit
+        }
+    )]
+
+
+def _ilike_ids(query, search_type, limit):
+    pattern = f'%{query}%'
+    if search_type in SEARCH_COLUMNS:
+        condition = getattr(ParkingLot, SEARCH_COLUMNS[search_type]).ilike(pattern)
+    else:
+        condition = (
+            ParkingLot.prime_location_name.ilike(pattern) |
+            ParkingLot.address.ilike(pattern) |
+            ParkingLot.pincode.ilike(pattern)
+        )
+    return [lot_id for (lot_id,) in db.session.query(ParkingLot.id)
+            .filter(condition).order_by(ParkingLot.id).limit(limit)]
+
+
+_fts_by_database = {}
+
+
+def _fts_available():
+    database = str(db.engine.url)
+    if database not in _fts_by_database:
+        _fts_by_database[database] = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'parking_lot_fts'"
+        )).first() is not None
+    return _fts_by_database[database]
@@ -0,0 +1,109 @@
+from sqlalchemy import text
+from .models import db
+
+def add_column(table, column, ddl_type):
+    """Step that adds a column unless create_all (or an earlier run) already made it"""
+    def step(connection):
+        existing = {row[1] for row in connection.execute(text(f'PRAGMA table_info({table})'))}
+        if column not in existing:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+    return step
+
+
+# Ordered schema changes for databases that predate a model change. The applied
+# version is kept in SQLite's PRAGMA user_version, so each step runs exactly once.
+# Fresh databases get the same objects from create_all and only record the version.
+MIGRATIONS = [
+    (1, 'Reservation history index', [
+        'CREATE INDEX IF NOT EXISTS ix_reservation_user_parked '
+        'ON reservation (user_id, parking_timestamp, id)',
+    ]),
+    (2, 'Reservation spot history and active-session indexes', [
+        # get_spot_details: latest reservation of a spot, scanned backwards
+        'CREATE INDEX IF NOT EXISTS ix_reservation_spot_parked '
+        'ON reservation (spot_id, parking_timestamp)',
+        # Sessions still in progress, a small slice of the table
+        'CREATE INDEX IF NOT EXISTS ix_reservation_active '
+        'ON reservation (user_id, parking_timestamp) WHERE leaving_timestamp IS NULL',
+        # Give the planner row counts so it prefers these over the user_id index
+        'ANALYZE reservation',
+    ]),
+    (3, 'Reservation release-time index for occupancy samples', [
+        'CREATE INDEX IF NOT EXISTS ix_reservation_left ON reservation (leaving_timestamp)',
+    ]),
+    (4, 'Parking lot search index', [
+        'CREATE INDEX IF NOT EXISTS ix_parking_lot_pincode ON parking_lot (pincode)',
+        # Trigram FTS5 index over the lot table itself (external content), so
+        # substring queries of 3+ characters are index lookups rather than scans
+        "CREATE VIRTUAL TABLE IF NOT EXISTS parking_lot_fts USING fts5("
+        "prime_location_name, address, pincode, "
+        "content='parking_lot', content_rowid='id', tokenize='trigram')",
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_fts_ai AFTER INSERT ON parking_lot BEGIN '
+        'INSERT INTO parking_lot_fts(rowid, prime_location_name, address, pincode) '
+        'VALUES (new.id, new.prime_location_name, new.address, new.pincode); END',
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_fts_ad AFTER DELETE ON parking_lot BEGIN '
+        "INSERT INTO parking_lot_fts(parking_lot_fts, rowid, prime_location_name, address, pincode) "
+        "VALUES ('delete', old.id, old.prime_location_name, old.address, old.pincode); END",
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_fts_au AFTER UPDATE ON parking_lot BEGIN '
+        "INSERT INTO parking_lot_fts(parking_lot_fts, rowid, prime_location_name, address, pincode) "
+        "VALUES ('delete', old.id, old.prime_location_name, old.address, old.pincode); "
+        'INSERT INTO parking_lot_fts(rowid, prime_location_name, address, pincode) '
+        'VALUES (new.id, new.prime_location_name, new.address, new.pincode); END',
+        "INSERT INTO parking_lot_fts(parking_lot_fts) VALUES ('rebuild')",
+    ]),
+    (5, 'Parking lot coordinates and R*Tree index', [
+        add_column('parking_lot', 'latitude', 'FLOAT'),
+        add_column('parking_lot', 'longitude', 'FLOAT'),
+        # Lots as points (min = max) in an R*Tree, so a bounding box around a
+        # location finds nearby lots without scanning the lot table
+        'CREATE VIRTUAL TABLE IF NOT EXISTS parking_lot_rtree USING rtree('
+        'id, min_lat, max_lat, min_lng, max_lng)',
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_rtree_ai AFTER INSERT ON parking_lot '
+        'WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN '
+        'INSERT INTO parking_lot_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); END',
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_rtree_ad AFTER DELETE ON parking_lot BEGIN '
+        'DELETE FROM parking_lot_rtree WHERE id = old.id; END',
+        'CREATE TRIGGER IF NOT EXISTS parking_lot_rtree_au AFTER UPDATE OF latitude, longitude ON parking_lot BEGIN '
+        'DELETE FROM parking_lot_rtree WHERE id = old.id; '
+        'INSERT INTO parking_lot_rtree SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude '
+        'WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END',
+        'INSERT OR REPLACE INTO parking_lot_rtree '
+        'SELECT id, latitude, latitude, longitude, longitude FROM parking_lot '
+        'WHERE latitude IS NOT NULL AND longitude IS NOT NULL',
+    ]),
+    (6, 'Occupancy buckets in the stored datetime format', [
+        # Folded buckets were once written without microseconds and sorted
+        # below their own boundary
+        "UPDATE occupancy_sample SET bucket_start = bucket_start || '.000000' "
+        "WHERE resolution != 'raw' AND length(bucket_start) = 19",
+    ]),
+]
+
+
+def schema_version(connection):
+    return connection.execute(text('PRAGMA user_version')).scalar()
+
+
+def upgrade(engine=None):
+    """Apply pending migrations in order and return the ones applied.
+
+    Statements are idempotent, so a step interrupted before its version was
+    recorded is simply run again next time.
+    """
+    engine = engine or db.engine
+    applied = []
+    with engine.connect() as connection:
+        current = schema_version(connection)
+        connection.commit()
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            with connection.begin():
+                for statement in statements:
+                    if callable(statement):
+                        statement(connection)
+                    else:
+                        connection.execute(text(statement))
+                connection.execute(text(f'PRAGMA user_version = {int(version)}'))
+            applied.append((version, description))
+    return applied
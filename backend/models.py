@@ -40,9 +40,12 @@ class ParkingLot(db.Model):
     prime_location_name = db.Column(db.String(255), nullable=False)
     price = db.Column(db.Float, nullable=False)
     address = db.Column(db.String(255), nullable=False)
-    pincode = db.Column(db.String(10), nullable=False)
+    pincode = db.Column(db.String(10), nullable=False, index=True)
     number_of_spots = db.Column(db.Integer, nullable=False)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
     spots = db.relationship('ParkingSpot', backref='lot', cascade='all, delete-orphan')
+    occupancy = db.relationship('LotOccupancy', backref='lot', uselist=False, cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -51,7 +54,9 @@ class ParkingLot(db.Model):
             "price": self.price,
             "address": self.address,
             "pincode": self.pincode,
-            "number_of_spots": self.number_of_spots
+            "number_of_spots": self.number_of_spots,
+            "latitude": self.latitude,
+            "longitude": self.longitude
         }
 
     def __repr__(self):
@@ -73,7 +78,53 @@ class ParkingSpot(db.Model):
             "status": self.status
         }
 
+class LotOccupancy(db.Model):
+    # Materialized spot counts per lot, kept in step with ParkingSpot.status writes
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), primary_key=True)
+    available_spots = db.Column(db.Integer, nullable=False, default=0)
+    occupied_spots = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "lot_id": self.lot_id,
+            "available_spots": self.available_spots,
+            "occupied_spots": self.occupied_spots
+        }
+
+class AdminSummarySnapshot(db.Model):
+    # Reservation-wide totals for the admin summary, refreshed by a beat task
+    id = db.Column(db.Integer, primary_key=True)
+    computed_at = db.Column(db.DateTime, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+
+class OccupancySample(db.Model):
+    # Append-only per-lot occupancy and revenue samples. 'raw' rows are single
+    # samples; older ones are summed into 'hour' and then 'day' rows, so every
+    # column is additive except occupied_max
+    lot_id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(4), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    samples = db.Column(db.Integer, nullable=False, default=1)
+    occupied_sum = db.Column(db.Integer, nullable=False, default=0)
+    occupied_max = db.Column(db.Integer, nullable=False, default=0)
+    capacity_sum = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_occupancy_sample_range', 'resolution', 'bucket_start'),
+    )
+
 class Reservation(db.Model):
+    __table_args__ = (
+        # Keyset pagination of a user's history on (parking_timestamp, id)
+        db.Index('ix_reservation_user_parked', 'user_id', 'parking_timestamp', 'id'),
+        db.Index('ix_reservation_spot_parked', 'spot_id', 'parking_timestamp'),
+        db.Index('ix_reservation_active', 'user_id', 'parking_timestamp',
+                 sqlite_where=db.text('leaving_timestamp IS NULL')),
+        db.Index('ix_reservation_left', 'leaving_timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -91,4 +142,14 @@ class Reservation(db.Model):
             "leaving_timestamp": self.leaving_timestamp,
             "parking_cost": self.parking_cost,
             "vehicle_number": self.vehicle_number
-        }
\ No newline at end of file
+        }
+
+class UserUsageRollup(db.Model):
+    # Completed sessions per user, day, lot and start hour, added to by release_booking
+    user_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    lot_id = db.Column(db.Integer, primary_key=True)
+    start_hour = db.Column(db.Integer, primary_key=True)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0)
\ No newline at end of file
@@ -0,0 +1,67 @@
+from itertools import groupby
+from .models import db, User, Role, ParkingLot, ParkingSpot, Reservation
+
+# Monthly report data for many users from one query ordered by user, read as a
+# stream and grouped in Python, instead of one reservation query per user
+
+
+def _activity_rows(start, end, first_id=None, last_id=None, batch_size=1000):
+    query = db.session.query(
+        User.id,
+        User.email,
+        User.full_name,
+        Reservation.id,
+        Reservation.spot_id,
+        Reservation.parking_timestamp,
+        Reservation.parking_cost,
+        ParkingSpot.lot_id,
+        ParkingLot.prime_location_name
+    ).join(Reservation, Reservation.user_id == User.id)\
+     .outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+     .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+     .filter(
+        ~User.roles.any(Role.name == 'admin'),
+        Reservation.parking_timestamp >= start,
+        Reservation.parking_timestamp < end
+     )
+    if first_id is not None:
+        query = query.filter(User.id >= first_id)
+    if last_id is not None:
+        query = query.filter(User.id <= last_id)
+    return query.order_by(User.id, Reservation.id).yield_per(batch_size)
+
+
+def iter_monthly_activity(start, end, first_id=None, last_id=None):
+    """Yield one report dict per non-admin user with bookings parked in [start, end), in user id order"""
+    for user_id, rows in groupby(_activity_rows(start, end, first_id, last_id), key=lambda row: row[0]):
+        rows = list(rows)
+        lot_counts = {}
+        lot_names = {}
+        bookings = []
+        total_amount = 0
+        for _, _, _, reservation_id, spot_id, parked, cost, lot_id, lot_name in rows:
+            total_amount += cost or 0
+            if lot_id:
+                lot_counts[lot_id] = lot_counts.get(lot_id, 0) + 1
+                lot_names[lot_id] = lot_name
+            bookings.append({
+                "id": reservation_id,
+                "lot_name": lot_name or "N/A",
+                "spot_id": spot_id or "N/A",
+                "date": parked.strftime('%Y-%m-%d'),
+                "cost": cost or 0
+            })
+
+        most_used_lot = "N/A"
+        if lot_counts:
+            most_used_lot = lot_names[max(lot_counts, key=lot_counts.get)] or "Unknown"
+
+        yield {
+            'user_id': user_id,
+            'email': rows[0][1],
+            'user_name': rows[0][2],
+            'total_bookings': len(bookings),
+            'total_amount': total_amount,
+            'most_used_lot': most_used_lot,
+            'bookings': bookings
+        }
@@ -0,0 +1,62 @@
+from sqlalchemy import case, func, update
+from .models import db, ParkingLot, ParkingSpot, LotOccupancy
+
+
+def adjust_counts(lot_id, available=0, occupied=0):
+    """Shift a lot's counters by the given deltas inside the caller's transaction"""
+    result = db.session.execute(
+        update(LotOccupancy)
+        .where(LotOccupancy.lot_id == lot_id)
+        .values(
+            available_spots=LotOccupancy.available_spots + available,
+            occupied_spots=LotOccupancy.occupied_spots + occupied
+        )
+    )
+    if result.rowcount == 0:
+        # No counter row yet (lot predates the table), build it from the spots
+        rebuild_counts(lot_id)
+
+
+def rebuild_counts(lot_id=None):
+    """Recompute counters from the spot table for one lot, or every lot"""
+    available = func.coalesce(func.sum(case((ParkingSpot.status == 'A', 1), else_=0)), 0)
+    occupied = func.coalesce(func.sum(case((ParkingSpot.status != 'A', 1), else_=0)), 0)
+    query = db.session.query(ParkingLot.id, available, occupied)\
+        .outerjoin(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)\
+        .group_by(ParkingLot.id)
+    if lot_id is not None:
+        query = query.filter(ParkingLot.id == lot_id)
+
+    counters_query = LotOccupancy.query
+    if lot_id is not None:
+        counters_query = counters_query.filter_by(lot_id=lot_id)
+    counters = {counter.lot_id: counter for counter in counters_query.all()}
+
+    rows = query.all()
+    for row_lot_id, available_spots, occupied_spots in rows:
+        counter = counters.pop(row_lot_id, None)
+        if counter is None:
+            counter = LotOccupancy(lot_id=row_lot_id)
+            db.session.add(counter)
+        counter.available_spots = available_spots
+        counter.occupied_spots = occupied_spots
+    for orphan in counters.values():
+        db.session.delete(orphan)
+    db.session.flush()
+    return len(rows)
+
+
+def get_counts(lot_id):
+    """Return (available, occupied) for a lot without touching its spots"""
+    counter = db.session.get(LotOccupancy, lot_id)
+    if counter is None:
+        rebuild_counts(lot_id)
+        counter = db.session.get(LotOccupancy, lot_id)
+    if counter is None:
+        return 0, 0
+    return counter.available_spots, counter.occupied_spots
+
+
+def counters_out_of_sync():
+    """True when some lot has no counter row (e.g. a database created before counters)"""
+    return LotOccupancy.query.count() != ParkingLot.query.count()
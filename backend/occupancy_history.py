@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, literal
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, ParkingSpot, Reservation, LotOccupancy, OccupancySample
+
+# Occupancy time series: the record-occupancy-sample beat task appends one
+# 'raw' row per lot every SAMPLE_INTERVAL seconds from the occupancy counters
+# plus the revenue released since the previous sample. downsample() folds raw
+# rows older than RAW_RETENTION into hourly rows and hourly rows older than
+# HOURLY_RETENTION into daily rows, so the table stays small.
+
+SAMPLE_INTERVAL = 300
+RAW_RETENTION = timedelta(days=2)
+HOURLY_RETENTION = timedelta(days=90)
+
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00',
+}
+# Resolutions fine enough to be summed into each bucket size
+BUCKET_SOURCES = {
+    'hour': ('raw', 'hour'),
+    'day': ('raw', 'hour', 'day'),
+}
+# SQLAlchemy stores SQLite datetimes as text with microseconds, and folded
+# buckets must compare against bound datetimes in that same form
+STORED_SUFFIX = '.000000'
+SUMMED = ('samples', 'occupied_sum', 'capacity_sum', 'revenue', 'sessions')
+
+
+def record_sample(now=None):
+    """Append a raw sample for every lot; returns the number of rows written"""
+    now = now or datetime.now()
+    last = db.session.query(func.max(OccupancySample.bucket_start))\
+        .filter(OccupancySample.resolution == 'raw').scalar()
+    since = last or now - timedelta(seconds=SAMPLE_INTERVAL)
+
+    released = {
+        lot_id: (revenue or 0, sessions)
+        for lot_id, revenue, sessions in db.session.query(
+            ParkingSpot.lot_id,
+            func.sum(Reservation.parking_cost),
+            func.count(Reservation.id)
+        ).join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+         .filter(Reservation.leaving_timestamp > since, Reservation.leaving_timestamp <= now)
+         .group_by(ParkingSpot.lot_id)
+    }
+
+    rows = []
+    for lot_id, available, occupied in db.session.query(
+        LotOccupancy.lot_id, LotOccupancy.available_spots, LotOccupancy.occupied_spots
+    ):
+        revenue, sessions = released.get(lot_id, (0, 0))
+        rows.append({
+            'lot_id': lot_id,
+            'resolution': 'raw',
+            'bucket_start': now,
+            'samples': 1,
+            'occupied_sum': occupied,
+            'occupied_max': occupied,
+            'capacity_sum': available + occupied,
+            'revenue': revenue,
+            'sessions': sessions
+        })
+    if rows:
+        db.session.execute(insert(OccupancySample), rows)
+    return len(rows)
+
+
+def downsample(now=None):
+    """Fold old raw rows into hours and old hourly rows into days; returns rows folded"""
+    now = now or datetime.now()
+    raw_cutoff = (now - RAW_RETENTION).replace(minute=0, second=0, microsecond=0)
+    hour_cutoff = (now - HOURLY_RETENTION).replace(hour=0, minute=0, second=0, microsecond=0)
+    return _fold('raw', 'hour', raw_cutoff) + _fold('hour', 'day', hour_cutoff)
+
+
+def _fold(source, target, cutoff):
+    # The cutoff sits on a target bucket boundary, so a bucket is folded in one go
+    bucket = func.strftime(BUCKET_FORMATS[target] + STORED_SUFFIX, OccupancySample.bucket_start)
+    rows = select(
+        OccupancySample.lot_id,
+        literal(target),
+        bucket,
+        func.sum(OccupancySample.samples),
+        func.sum(OccupancySample.occupied_sum),
+        func.max(OccupancySample.occupied_max),
+        func.sum(OccupancySample.capacity_sum),
+        func.sum(OccupancySample.revenue),
+        func.sum(OccupancySample.sessions)
+    ).where(OccupancySample.resolution == source, OccupancySample.bucket_start < cutoff)\
+     .group_by(OccupancySample.lot_id, bucket)
+
+    stmt = insert(OccupancySample).from_select(
+        ['lot_id', 'resolution', 'bucket_start', 'samples', 'occupied_sum',
+         'occupied_max', 'capacity_sum', 'revenue', 'sessions'],
+        rows
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['lot_id', 'resolution', 'bucket_start'],
+        set_=dict(
+            {name: getattr(OccupancySample, name) + stmt.excluded[name] for name in SUMMED},
+            occupied_max=func.max(OccupancySample.occupied_max, stmt.excluded.occupied_max)
+        )
+    )
+    db.session.execute(stmt)
+    return db.session.query(OccupancySample)\
+        .filter(OccupancySample.resolution == source, OccupancySample.bucket_start < cutoff)\
+        .delete(synchronize_session=False)
+
+
+def occupancy_history(start, end, bucket='hour', lot_id=None):
+    """Samples in [start, end) summed into hour or day buckets, for one lot or all of them"""
+    bucket_start = func.strftime(BUCKET_FORMATS[bucket], OccupancySample.bucket_start)
+    query = db.session.query(
+        bucket_start,
+        func.sum(OccupancySample.occupied_sum),
+        func.sum(OccupancySample.capacity_sum),
+        func.max(OccupancySample.occupied_max),
+        func.sum(OccupancySample.revenue),
+        func.sum(OccupancySample.sessions)
+    ).filter(
+        OccupancySample.resolution.in_(BUCKET_SOURCES[bucket]),
+        OccupancySample.bucket_start >= start,
+        OccupancySample.bucket_start < end
+    )
+    if lot_id is not None:
+        query = query.filter(OccupancySample.lot_id == lot_id)
+    return [
+        {
+            'bucket': bucket_value,
+            'occupancyRate': round(occupied / capacity, 4) if capacity else 0,
+            'maxOccupied': max_occupied,
+            'revenue': round(revenue or 0, 2),
+            'sessions': sessions
+        }
+        for bucket_value, occupied, capacity, max_occupied, revenue, sessions
+        in query.group_by(bucket_start).order_by(bucket_start)
+    ]
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_, exists
+from sqlalchemy.orm import joinedload, selectinload
+from .models import User, Role, ParkingSpot, Reservation
+
+# Shared reservation queries that bring spot and lot along in the same SELECT,
+# so callers can read booking.spot.lot without one lazy load per row
+
+
+def with_spot_and_lot(query):
+    return query.options(joinedload(Reservation.spot).joinedload(ParkingSpot.lot))
+
+
+def user_export_rows(user_id, batch_size=1000):
+    """CSV export columns for a user's reservations, streamed in batches by id"""
+    return Reservation.query.with_entities(
+        ParkingSpot.lot_id,
+        Reservation.spot_id,
+        Reservation.parking_timestamp,
+        Reservation.leaving_timestamp,
+        Reservation.parking_cost,
+        Reservation.vehicle_number
+    ).outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+     .filter(Reservation.user_id == user_id)\
+     .order_by(Reservation.id)\
+     .yield_per(batch_size)
+
+
+def reservation_with_lot(reservation_id):
+    return with_spot_and_lot(Reservation.query.filter(Reservation.id == reservation_id)).first()
+
+
+def non_admin_users():
+    """Users without the admin role, with roles loaded in one extra query rather than per user"""
+    return User.query.options(selectinload(User.roles))\
+        .filter(~User.roles.any(Role.name == 'admin'))\
+        .order_by(User.id)
+
+
+def users_without_booking(start, end):
+    """(id, email, full_name) of non-admin users with no reservation parked in [start, end).
+
+    A single anti-join answered from the (user_id, parking_timestamp) index;
+    plain column rows so callers can stream them with yield_per.
+    """
+    booked = exists().where(
+        Reservation.user_id == User.id,
+        Reservation.parking_timestamp >= start,
+        Reservation.parking_timestamp < end
+    )
+    return User.query.with_entities(User.id, User.email, User.full_name)\
+        .filter(~User.roles.any(Role.name == 'admin'), ~booked)\
+        .order_by(User.id)
+
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if len(payload) != len(columns):
+            raise InvalidCursor(cursor)
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, payload)
+        ]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def keyset_page(query, columns, key, cursor=None, limit=20, descending=False):
+    """One page of query ordered by columns, continuing after cursor.
+
+    Filters with a row-value comparison on the sort key instead of OFFSET, so
+    every page costs the same index range scan. Returns (rows, next_cursor).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        after = decode_cursor(cursor, columns)
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*after))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*after))
+    query = query.order_by(*[column.desc() if descending else column for column in columns])
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(key(rows[limit - 1])) if len(rows) > limit else None
+    return rows[:limit], next_cursor
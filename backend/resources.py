@@ -2,7 +2,11 @@ from flask import request, jsonify, g
 from flask_restful import Api, Resource, reqparse, marshal_with, fields
 from .models import *
 from functools import wraps
-from .extensions import cache
+from .extensions import cache, spot_index, token_cache
+from .occupancy import adjust_counts
+from .allocation import add_spots, remove_free_spots
+from .lot_geo import parse_coordinates
+from .cache_versions import LOT_CACHE_TIMEOUT, lots_key, lot_key, touch_lot
 
 def token_required(f):
     @wraps(f)
@@ -13,8 +17,8 @@ def token_required(f):
         
         token = auth_header.split(' ')[1]
         
-        # Find user by fs_uniquifier (our token)
-        user = User.query.filter_by(fs_uniquifier=token).first()
+        # Find user by fs_uniquifier (our token), served from the auth cache
+        user = token_cache.resolve(token)
         if not user:
             return jsonify({'message': 'Token is invalid'}), 401
         
@@ -58,7 +62,9 @@ parkinglot_fields = {
     'address': fields.String,
     'pincode': fields.String,
     'price': fields.Integer,
-    'number_of_spots': fields.Integer
+    'number_of_spots': fields.Integer,
+    'latitude': fields.Float,
+    'longitude': fields.Float
 }
 
 parkingspot_fields = {
@@ -69,7 +75,7 @@ parkingspot_fields = {
 
 class ParkingLotAPI(Resource): 
     @token_required
-    @cache.cached(timeout=10)  
+    @cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lots_key('resource'))
     @marshal_with(parkinglot_fields)
     def get(self):
         return ParkingLot.query.all()
@@ -85,35 +91,41 @@ class ParkingLotAPI(Resource):
         if existing_lot:
             return {"message": "Parking lot with this address already exists."}, 409
 
+        try:
+            latitude, longitude = parse_coordinates(data.get('latitude'), data.get('longitude'))
+        except (TypeError, ValueError):
+            return {"error": "Invalid latitude or longitude"}, 400
+
         new_parkinglot = ParkingLot(
             prime_location_name=data.get('prime_location_name'),
             price=data.get('price'),
             address=data.get('address'),
             pincode=data.get('pincode'),
-            number_of_spots=data.get('number_of_spots')
+            number_of_spots=data.get('number_of_spots'),
+            latitude=latitude,
+            longitude=longitude
         )
-        db.session.add(new_parkinglot)
-        db.session.commit()
 
-        # Create parking spots for the new lot
+        # The lot, its spots and its counters commit together or not at all
         try:
-            for i in range(data.get('number_of_spots')):
-                new_spot = ParkingSpot(
-                    lot_id=new_parkinglot.id,
-                    status='A'  # Available by default
-                )
-                db.session.add(new_spot)
+            db.session.add(new_parkinglot)
+            db.session.flush()
+            db.session.add(LotOccupancy(lot_id=new_parkinglot.id, available_spots=0, occupied_spots=0))
+            db.session.flush()
+            add_spots(new_parkinglot.id, data.get('number_of_spots') or 0)
+            touch_lot()
             db.session.commit()
         except Exception as e:
-            print(f"Error creating parking spots: {str(e)}")
-            # Don't fail the lot creation if spot creation fails
-            pass
+            db.session.rollback()
+            print(f"Error creating parking lot: {str(e)}")
+            return {"error": "Failed to create parking lot"}, 500
+        spot_index.refresh_lot(new_parkinglot.id)
 
         return {"message": "Parking lot added successfully!"}, 200
 
 class SingleParkingLotAPI(Resource):
     @token_required
-    @cache.memoize(timeout=10)
+    @cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lot_key('resource'))
     @marshal_with(parkinglot_fields)
     def get(self, lot_id):
         lot = ParkingLot.query.get_or_404(lot_id)
@@ -125,6 +137,12 @@ class SingleParkingLotAPI(Resource):
         data = request.get_json()
         lot = ParkingLot.query.get_or_404(lot_id)
         old_spot_count = lot.number_of_spots
+        if 'latitude' in data or 'longitude' in data:
+            try:
+                lot.latitude, lot.longitude = parse_coordinates(
+                    data.get('latitude', lot.latitude), data.get('longitude', lot.longitude))
+            except (TypeError, ValueError):
+                return {'error': 'Invalid latitude or longitude'}, 400
 
         try:
             lot.prime_location_name = data.get('prime_location_name', lot.prime_location_name)
@@ -136,20 +154,18 @@ class SingleParkingLotAPI(Resource):
             
             # Handle spot count changes
             if new_spot_count > old_spot_count:
-                # Add new spots
-                for i in range(new_spot_count - old_spot_count):
-                    new_spot = ParkingSpot(lot_id=lot_id, status='A')
-                    db.session.add(new_spot)
+                add_spots(lot_id, new_spot_count - old_spot_count)
             elif new_spot_count < old_spot_count:
                 # Remove excess spots (only if they're available)
-                spots_to_remove = ParkingSpot.query.filter_by(
-                    lot_id=lot_id, status='A'
-                ).limit(old_spot_count - new_spot_count).all()
-                
-                for spot in spots_to_remove:
-                    db.session.delete(spot)
+                to_remove = old_spot_count - new_spot_count
+                removed = remove_free_spots(lot_id, to_remove)
+                if removed < to_remove:
+                    db.session.rollback()
+                    return {'error': f'Only {removed} free spots can be removed right now'}, 409
             
+            touch_lot(lot_id)
             db.session.commit()
+            spot_index.refresh_lot(lot_id)
             return {'message': 'Parking lot updated successfully'}, 200
         except Exception as e:
             db.session.rollback()
@@ -164,16 +180,21 @@ class SingleParkingLotAPI(Resource):
             return {"message": "Parking lot not found"}, 404
 
         # Check if any spots are occupied before deleting
-        spots = ParkingSpot.query.filter_by(lot_id=lot_id).all()
-        if any(spot.status != 'A' for spot in spots):
+        occupied_spot = ParkingSpot.query.filter(
+            ParkingSpot.lot_id == lot_id, ParkingSpot.status != 'A'
+        ).first()
+        if occupied_spot:
             return {"message": "Cannot delete. Some spots may be occupied."}, 400
 
         try:
-            # Delete all spots first
+            # Delete all spots and the lot's counters first
             ParkingSpot.query.filter_by(lot_id=lot_id).delete()
+            LotOccupancy.query.filter_by(lot_id=lot_id).delete()
             # Then delete the lot
             db.session.delete(lot)
+            touch_lot(lot_id)
             db.session.commit()
+            spot_index.drop_lot(lot_id)
             return {"message": "Parking lot deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
@@ -183,7 +204,7 @@ class SingleParkingLotAPI(Resource):
 class ParkingSpotAPI(Resource):
     @token_required
     @admin_required
-    @cache.cached(timeout=10)
+    @cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lots_key('resource'))
     @marshal_with(parkingspot_fields)
     def get(self):
         return ParkingSpot.query.all()
@@ -212,7 +233,14 @@ class ParkingSpotAPI(Resource):
                 status=status  # Default to available
             )
             db.session.add(new_spot)
+            if status == 'A':
+                adjust_counts(lot_id, available=1)
+            else:
+                adjust_counts(lot_id, occupied=1)
+            touch_lot(lot_id)
             db.session.commit()
+            if status == 'A':
+                spot_index.mark_free(lot_id, new_spot.id)
             
             print(f"Successfully created spot with ID {new_spot.id}")
             return new_spot, 201
@@ -223,7 +251,7 @@ class ParkingSpotAPI(Resource):
 
 class SingleParkingSpotAPI(Resource):
     @token_required
-    @cache.memoize(timeout=10)
+    @cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lots_key('resource'))
     @marshal_with(parkingspot_fields)
     def get(self, spot_id):
         spot = ParkingSpot.query.get_or_404(spot_id)
@@ -238,12 +266,22 @@ class SingleParkingSpotAPI(Resource):
             
         try:
             lot = ParkingLot.query.get(spot.lot_id)
+            lot_id = spot.lot_id
+            was_available = spot.status == 'A'
+            # Delete first: a lot without a counter row is rebuilt from its spots
             db.session.delete(spot)
+            db.session.flush()
+            if was_available:
+                adjust_counts(lot_id, available=-1)
+            else:
+                adjust_counts(lot_id, occupied=-1)
+            touch_lot(lot_id)
             if lot and lot.number_of_spots > 0:
                 lot.number_of_spots -= 1
                 if lot.number_of_spots == 0:
                     db.session.delete(lot)
             db.session.commit()
+            spot_index.mark_taken(lot_id, spot_id)
             return {"message": "Spot deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
@@ -1,19 +1,37 @@
+import os
 from flask import Blueprint, request, jsonify, session, render_template, g, current_app, send_file, make_response
 from flask_login import login_user
 from sqlalchemy import func, desc, and_, or_
+from sqlalchemy.orm import selectinload
 from flask_security import roles_required, hash_password, verify_password, auth_required, current_user
-from .models import db, User, Role, ParkingLot, ParkingSpot, Reservation
+from .models import db, User, Role, ParkingLot, ParkingSpot, Reservation, LotOccupancy
+from .occupancy import get_counts
+from .allocation import claim_spot, claim_any_spot, release_spot
+from .cache_versions import LOT_CACHE_TIMEOUT, lots_key, lot_key
+from .user_rollups import record_completed, build_summary
+from .analytics import load_columns, summarize
+from .admin_summary import build_admin_summary
+from .occupancy_history import occupancy_history
+from .lot_search import search_lots
+from .lot_geo import nearest_lots, parse_coordinates, pincode_centroid
+from .queries import reservation_with_lot, with_spot_and_lot, keyset_page, InvalidCursor
 from flask import Flask, redirect, url_for, flash
 from flask import current_app as app
 from werkzeug.security import generate_password_hash, check_password_hash 
 from functools import wraps
 from datetime import datetime, timedelta 
-from .extensions import cache
-import calendar
-from backend.celery.tasks import create_user_csv
+from .extensions import cache, spot_index, token_cache
+from backend.celery.tasks import create_user_csv, create_reservations_export, export_range, monthly_report_progress
+from backend.celery import bulk_export
+from backend.celery.bulk_export import EXPORT_FORMATS
+from backend.celery.export_store import find_export, user_export_filename
 from celery.result import AsyncResult
+from celery.exceptions import TimeoutError as CeleryTimeoutError
 
 routes_app = Blueprint('routes_app', __name__)
+
+# Longest a client's export long poll is held open
+EXPORT_WAIT_TIMEOUT = 25
 # cache = app.cache
 
 def token_required(f):
@@ -24,7 +42,7 @@ def token_required(f):
             return jsonify({'message': 'Token is missing'}), 401
         
         token = auth_header.split(' ')[1]
-        user = User.query.filter_by(fs_uniquifier=token).first()
+        user = token_cache.resolve(token)
         if not user:
             return jsonify({'message': 'Token is invalid'}), 401
         g.current_user = user
@@ -38,20 +56,90 @@ def home():
 @routes_app.route('/api/user-csv-export', methods=['POST'])
 @token_required
 def trigger_user_csv_export():
+    data = request.get_json(silent=True) or {}
+    if (data.get('scope') or request.args.get('scope')) == 'all':
+        return _trigger_reservations_export(data)
     user_id = g.current_user.id
-    task = create_user_csv.delay(user_id)
+    compress = request.args.get('gzip', '').lower() in ('1', 'true')
+    # Unchanged history: hand back the export already on disk
+    filename = user_export_filename(user_id, compress)
+    if find_export(filename):
+        return jsonify({'task_id': None, 'download_url': f'/api/user-csv-export/file/{filename}'}), 200
+    task = create_user_csv.delay(user_id, compress=compress)
+    return jsonify({'task_id': task.id}), 202
+
+def _trigger_reservations_export(data):
+    """scope=all: every user's reservations, for admins; polled through the same GET endpoint"""
+    if not any(role.name == 'admin' for role in g.current_user.roles):
+        return jsonify({'error': 'Admin access required'}), 403
+    start = data.get('start') or request.args.get('start')
+    end = data.get('end') or request.args.get('end')
+    formats = data.get('formats') or request.args.get('formats', 'csv')
+    if isinstance(formats, str):
+        formats = formats.split(',')
+    split_by_month = (data.get('split') or request.args.get('split')) == 'month'
+    try:
+        export_range(start, end)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid start or end date'}), 400
+    if not isinstance(formats, list) or not formats or any(f not in EXPORT_FORMATS for f in formats):
+        return jsonify({'error': f"formats must be among {', '.join(EXPORT_FORMATS)}"}), 400
+    if 'parquet' in formats and bulk_export.pa is None:
+        return jsonify({'error': 'Parquet export is not available on this server'}), 400
+    task = create_reservations_export.delay(start, end, formats=list(formats), split_by_month=split_by_month)
     return jsonify({'task_id': task.id}), 202
 
+def _may_download_export(filename):
+    """Users get their own exports; the all-users reservation dumps are admin only"""
+    filename = os.path.basename(filename or '')
+    if filename.startswith(f'user_parking_{g.current_user.id}_'):
+        return True
+    return filename.startswith('reservations_') and \
+        any(role.name == 'admin' for role in g.current_user.roles)
+
 @routes_app.route('/api/user-csv-export/<task_id>', methods=['GET'])
 @token_required
 def get_user_csv_export(task_id):
     result = AsyncResult(task_id)
     if result.ready() and result.successful():
-        filename = result.result
-        filepath = f'./backend/celery/user-downloads/{filename}'
+        if not _may_download_export(result.result):
+            return jsonify({'error': 'Unauthorized access'}), 403
+        filepath = find_export(result.result)
+        if not filepath:
+            return jsonify({'error': 'Export has expired'}), 410
         return send_file(filepath, as_attachment=True)
     else:
         return jsonify({'status': 'pending'}), 202
+
+@routes_app.route('/api/user-csv-export/<task_id>/wait', methods=['GET'])
+@token_required
+def wait_for_user_csv_export(task_id):
+    """Long poll: hold the request until the export task finishes or the wait times out"""
+    timeout = request.args.get('timeout', EXPORT_WAIT_TIMEOUT, type=float)
+    if timeout <= 0:
+        return jsonify({'error': 'timeout must be positive'}), 400
+    timeout = min(timeout, EXPORT_WAIT_TIMEOUT)
+    result = AsyncResult(task_id)
+    try:
+        # The Redis result backend notifies over pub/sub, so this waits without polling
+        result.get(timeout=timeout, propagate=False)
+    except CeleryTimeoutError:
+        return jsonify({'status': 'pending'}), 202
+    if not result.successful():
+        return jsonify({'status': 'failed'}), 500
+    if not _may_download_export(result.result):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    return jsonify({'status': 'ready', 'download_url': f'/api/user-csv-export/{task_id}'}), 200
+
+@routes_app.route('/api/user-csv-export/file/<filename>', methods=['GET'])
+@token_required
+def get_cached_user_csv_export(filename):
+    if not _may_download_export(filename):
+        return jsonify({'error': 'Unauthorized access'}), 403
+    filepath = find_export(filename)
+    if not filepath:
+        return jsonify({'error': 'Export has expired'}), 410
+    return send_file(filepath, as_attachment=True)
     
 
 
@@ -136,16 +224,36 @@ def register():
 @auth_required('token')
 @roles_required('admin')
 def admin_dashboard():
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-
-    lots = ParkingLot.query.all()
+    cursor = request.args.get('cursor')
+    status = request.args.get('status')
+
+    query = _lot_availability_query()
+    if status == 'available':
+        query = query.filter(LotOccupancy.available_spots > 0)
+    elif status == 'full':
+        query = query.filter(func.coalesce(LotOccupancy.available_spots, 0) == 0)
+    try:
+        rows, next_cursor = keyset_page(query, [ParkingLot.id], key=lambda row: (row[0].id,),
+                                        cursor=cursor, limit=per_page)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    # Only the spots of lots on this page
+    spots_by_lot = {}
+    lot_ids = [lot.id for lot, _, _ in rows]
+    if lot_ids:
+        for spot in ParkingSpot.query.filter(ParkingSpot.lot_id.in_(lot_ids)).order_by(ParkingSpot.id).all():
+            spots_by_lot.setdefault(spot.lot_id, []).append(spot.to_dict())
     lot_data = []
-    for lot in lots:
-        spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-        spot_data = [spot.to_dict() for spot in spots]
-        lot_data.append({"lot": lot.to_dict(), "spots": spot_data})
-    return jsonify(lot_data), 200
+    for lot, available_spots, occupied_spots in rows:
+        lot_data.append({
+            "lot": lot.to_dict(),
+            "spots": spots_by_lot.get(lot.id, []),
+            "available_spots": available_spots,
+            "occupied_spots": occupied_spots
+        })
+    return jsonify({'lots': lot_data, 'next_cursor': next_cursor}), 200
 
 @routes_app.route('/api/registered-users', methods=['GET'])
 @token_required
@@ -153,7 +261,21 @@ def get_registered_users():
     user = g.current_user
     if not any(role.name == 'admin' for role in user.roles):
         return jsonify({'error': 'Admin access required'}), 403
-    users = User.query.all()
+    query = User.query.options(selectinload(User.roles))
+    active = request.args.get('active')
+    if active in ('true', 'false'):
+        query = query.filter(User.active == (active == 'true'))
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    next_cursor = None
+    if limit or cursor:
+        try:
+            users, next_cursor = keyset_page(query, [User.id], key=lambda u: (u.id,),
+                                             cursor=cursor, limit=limit or 20)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        users = query.order_by(User.id).all()
     user_list = []
     for user in users:
         user_list.append({
@@ -167,7 +289,26 @@ def get_registered_users():
             'active': user.active,
             'roles': [{'id': r.id, 'name': r.name} for r in user.roles]
         })
-    return jsonify({'users': user_list}), 200
+    return jsonify({'users': user_list, 'next_cursor': next_cursor}), 200
+
+@routes_app.route('/api/auth-cache/stats', methods=['GET'])
+@token_required
+def get_auth_cache_stats():
+    user = g.current_user
+    if not any(role.name == 'admin' for role in user.roles):
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify(token_cache.snapshot()), 200
+
+@routes_app.route('/api/monthly-reports/<month>/progress', methods=['GET'])
+@token_required
+def get_monthly_report_progress(month):
+    user = g.current_user
+    if not any(role.name == 'admin' for role in user.roles):
+        return jsonify({'error': 'Admin access required'}), 403
+    progress = monthly_report_progress(month)
+    if progress is None:
+        return jsonify({'error': 'No report run for this month'}), 404
+    return jsonify(progress), 200
 
 @routes_app.route('/customer', methods=['GET'])
 @token_required
@@ -228,6 +369,7 @@ def update_profile(user_id):
 
     try:
         db.session.commit()
+        token_cache.invalidate_user(user)
         return jsonify({"message": "Profile updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -239,22 +381,9 @@ def update_profile(user_id):
 def search_parking_lots():
     query = request.args.get('q', '').strip().lower()
     search_type = request.args.get('type', 'all')
-    lots_query = ParkingLot.query
-
-    if query:
-        if search_type == 'name':
-            lots_query = lots_query.filter(ParkingLot.prime_location_name.ilike(f'%{query}%'))
-        elif search_type == 'address':
-            lots_query = lots_query.filter(ParkingLot.address.ilike(f'%{query}%'))
-        elif search_type == 'pincode':
-            lots_query = lots_query.filter(ParkingLot.pincode.ilike(f'%{query}%'))
-        else:  # all
-            lots_query = lots_query.filter(
-                (ParkingLot.prime_location_name.ilike(f'%{query}%')) |
-                (ParkingLot.address.ilike(f'%{query}%')) |
-                (ParkingLot.pincode.ilike(f'%{query}%'))
-            )
-    lots = lots_query.all()
+    limit = request.args.get('limit', 50, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    lots = search_lots(query, search_type, limit=limit, offset=offset)
     return jsonify([{
         'id': lot.id,
         'prime_location_name': lot.prime_location_name,
@@ -263,25 +392,52 @@ def search_parking_lots():
         'number_of_spots': lot.number_of_spots
     } for lot in lots])
 
+@routes_app.route('/api/parkinglots/nearest', methods=['GET'])
+@token_required
+def get_nearest_parking_lots():
+    k = request.args.get('k', 10, type=int)
+    pincode = request.args.get('pincode', '').strip()
+    try:
+        latitude, longitude = parse_coordinates(request.args.get('lat'), request.args.get('lng'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid lat or lng'}), 400
+    if latitude is None:
+        if not pincode:
+            return jsonify({'error': 'lat and lng or pincode required'}), 400
+        centroid = pincode_centroid(pincode)
+        if centroid is None:
+            return jsonify({'error': 'No located parking lots for this pincode'}), 404
+        latitude, longitude = centroid
+
+    lot_data = []
+    for lot, available_spots, distance in nearest_lots(latitude, longitude, k=k):
+        lot_dict = lot.to_dict()
+        lot_dict['available_spots'] = available_spots
+        lot_dict['distance_km'] = round(distance, 3)
+        lot_data.append(lot_dict)
+    return jsonify({'latitude': latitude, 'longitude': longitude, 'lots': lot_data}), 200
+
+def _lot_availability_query():
+    return db.session.query(
+        ParkingLot,
+        func.coalesce(LotOccupancy.available_spots, 0),
+        func.coalesce(LotOccupancy.occupied_spots, 0)
+    ).outerjoin(LotOccupancy, LotOccupancy.lot_id == ParkingLot.id)
+
+
+def _lot_availability():
+    """Return (lot, available, occupied) for every lot from the occupancy counters"""
+    return _lot_availability_query().order_by(ParkingLot.id).all()
+
 @routes_app.route('/api/parkinglots', methods=['GET'])
-@cache.cached(timeout=2)
+@cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lots_key('view'))
 def get_all_parking_lots():
     try:
-        lots = ParkingLot.query.all()
         lot_data = []
-        for lot in lots:
-            available_spots = ParkingSpot.query.filter_by(
-                lot_id=lot.id, 
-                status='A'
-            ).count()
-            lot_dict = lot.to_dict() if hasattr(lot, 'to_dict') else {
-                'id': lot.id,
-                'prime_location_name': lot.prime_location_name,
-                'address': lot.address,
-                'pincode': lot.pincode,
-                'number_of_spots': lot.number_of_spots
-            }
+        for lot, available_spots, occupied_spots in _lot_availability():
+            lot_dict = lot.to_dict()
             lot_dict['available_spots'] = available_spots
+            lot_dict['occupied_spots'] = occupied_spots
             lot_data.append(lot_dict)
         return jsonify(lot_data), 200
     except Exception as e:
@@ -290,25 +446,17 @@ def get_all_parking_lots():
 
 @routes_app.route('/api/parkinglots/<int:lot_id>', methods=['GET'])
 @token_required
-@cache.memoize(timeout=2)
+@cache.cached(timeout=LOT_CACHE_TIMEOUT, key_prefix=lot_key('view'))
 def get_parking_lot_by_id(lot_id):
     print("Current user roles:", [role.name for role in g.current_user.roles])
     try:
         lot = ParkingLot.query.get(lot_id)
         if not lot:
             return jsonify({"error": "Parking lot not found"}), 404
-        available_spots = ParkingSpot.query.filter_by(
-            lot_id=lot.id, 
-            status='A'
-        ).count()
-        lot_data = lot.to_dict() if hasattr(lot, 'to_dict') else {
-            'id': lot.id,
-            'prime_location_name': lot.prime_location_name,
-            'address': lot.address,
-            'pincode': lot.pincode,
-            'number_of_spots': lot.number_of_spots
-        }
+        available_spots, occupied_spots = get_counts(lot.id)
+        lot_data = lot.to_dict()
         lot_data['available_spots'] = available_spots
+        lot_data['occupied_spots'] = occupied_spots
         return jsonify(lot_data), 200
         print("Current user roles:", [role.name for role in g.current_user.roles])
     except Exception as e:
@@ -338,32 +486,72 @@ def get_available_spots_updated():
         print("Error fetching available spots:", str(e))
         return jsonify({"error": "Failed to fetch available spots"}), 500
 
+@routes_app.route('/api/parkingspots/next-available', methods=['GET'])
+@token_required
+def get_next_available_spot():
+    try:
+        lot_id = request.args.get('lot_id', type=int)
+        if not lot_id:
+            return jsonify({"error": "lot_id is required"}), 400
+        spot_id = spot_index.next_free(lot_id)
+        if spot_id is None:
+            # The index may have missed a rolled back claim; heal it from the spot table
+            available_spots, _ = get_counts(lot_id)
+            if available_spots:
+                spot_index.refresh_lot(lot_id)
+                spot_id = spot_index.next_free(lot_id)
+        return jsonify({
+            "lot_id": lot_id,
+            "spot": {"id": spot_id, "lot_id": lot_id, "status": 'A'} if spot_id else None,
+            "available_spots": spot_index.free_count(lot_id)
+        }), 200
+    except Exception as e:
+        print("Error fetching next available spot:", str(e))
+        return jsonify({"error": "Failed to fetch next available spot"}), 500
+
 @routes_app.route('/api/bookings', methods=['POST'])
 @token_required
 def create_booking():
     try:
         data = request.get_json()
-        required_fields = ['spot_id', 'user_id', 'vehicle_number']
+        required_fields = ['user_id', 'vehicle_number']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({"error": f"{field} is required"}), 400
-        spot = ParkingSpot.query.get(data['spot_id'])
-        if not spot:
-            return jsonify({"error": "Parking spot not found"}), 404
-        if spot.status != 'A':
-            return jsonify({"error": "Parking spot is not available"}), 400
+
+        # Claim the spot with a conditional UPDATE so two concurrent
+        # bookings can never both see it as available
+        if data.get('spot_id'):
+            spot = ParkingSpot.query.get(data['spot_id'])
+            if not spot:
+                return jsonify({"error": "Parking spot not found"}), 404
+            spot_id = spot.id if claim_spot(spot.id) is not None else None
+            if spot_id is None:
+                # The id came from a free-spot index that may be stale (another
+                # process took it); drop it and take any free spot in the lot
+                spot_index.mark_taken(spot.lot_id, spot.id)
+                spot_id = claim_any_spot(spot.lot_id)
+                if spot_id is None:
+                    return jsonify({"error": "No parking spots available in this lot"}), 400
+        elif data.get('lot_id'):
+            spot_id = claim_any_spot(int(data['lot_id']))
+            if spot_id is None:
+                return jsonify({"error": "No parking spots available in this lot"}), 400
+        else:
+            return jsonify({"error": "spot_id or lot_id is required"}), 400
+
         reservation = Reservation(
-            spot_id=data['spot_id'],
+            spot_id=spot_id,
             user_id=data['user_id'],
             vehicle_number=data['vehicle_number'],
             parking_timestamp=datetime.now()
         )
-        spot.status = 'O'
         db.session.add(reservation)
         db.session.commit()
         return jsonify({
             "message": "Booking created successfully",
-            "booking_id": reservation.id
+            "booking_id": reservation.id,
+            "spot_id": spot_id
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -371,15 +559,48 @@ def create_booking():
         import traceback; traceback.print_exc()
         return jsonify({"error": "Failed to create booking"}), 500
 
+def _filter_bookings(query, args):
+    """Apply the optional from/to (ISO dates) and status (A or R) booking filters"""
+    if args.get('from'):
+        query = query.filter(Reservation.parking_timestamp >= datetime.fromisoformat(args['from']))
+    if args.get('to'):
+        end = datetime.fromisoformat(args['to'])
+        if len(args['to']) == 10:
+            end += timedelta(days=1)
+            query = query.filter(Reservation.parking_timestamp < end)
+        else:
+            query = query.filter(Reservation.parking_timestamp <= end)
+    if args.get('status') == 'A':
+        query = query.filter(Reservation.leaving_timestamp.is_(None))
+    elif args.get('status') == 'R':
+        query = query.filter(Reservation.leaving_timestamp.isnot(None))
+    return query
+
 @routes_app.route('/api/bookings/user/<int:user_id>', methods=['GET'])
 @token_required
 def get_user_bookings(user_id):
     try:
         if not hasattr(g, 'current_user') or g.current_user.id != user_id:
             return jsonify({"error": "Unauthorized access"}), 403
-        bookings = Reservation.query.filter_by(user_id=user_id).order_by(
-            Reservation.parking_timestamp.desc()
-        ).all()
+        query = with_spot_and_lot(Reservation.query.filter(Reservation.user_id == user_id))
+        try:
+            query = _filter_bookings(query, request.args)
+        except ValueError:
+            return jsonify({"error": "Invalid date filter"}), 400
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        paged = bool(limit or cursor)
+        if paged:
+            try:
+                bookings, next_cursor = keyset_page(
+                    query, [Reservation.parking_timestamp, Reservation.id],
+                    key=lambda b: (b.parking_timestamp, b.id),
+                    cursor=cursor, limit=limit or 20, descending=True
+                )
+            except InvalidCursor:
+                return jsonify({"error": "Invalid cursor"}), 400
+        else:
+            bookings = query.order_by(Reservation.parking_timestamp.desc(), Reservation.id.desc()).all()
         booking_data = []
         for booking in bookings:
             lot_id = booking.spot.lot_id if booking.spot else None
@@ -397,6 +618,8 @@ def get_user_bookings(user_id):
                 'status': status 
             }
             booking_data.append(booking_dict)
+        if paged:
+            return jsonify({'bookings': booking_data, 'next_cursor': next_cursor}), 200
         return jsonify(booking_data), 200
     except Exception as e:
         print("Error fetching user bookings:", str(e))
@@ -407,7 +630,7 @@ def get_user_bookings(user_id):
 @token_required
 def get_booking_by_id(booking_id):
     try:
-        booking = Reservation.query.get(booking_id)
+        booking = reservation_with_lot(booking_id)
         if not booking:
             return jsonify({"error": "Booking not found"}), 404
         if not hasattr(g, 'current_user') or g.current_user.id != booking.user_id:
@@ -467,6 +690,8 @@ def release_booking(booking_id):
             return jsonify({"error": "Booking not found"}), 404
         if not hasattr(g, 'current_user') or g.current_user.id != booking.user_id:
             return jsonify({"error": "Unauthorized access"}), 403
+        if booking.leaving_timestamp:
+            return jsonify({"error": "Booking already released"}), 400
         data = request.get_json()
         booking.leaving_timestamp = datetime.now()
         spot = ParkingSpot.query.get(booking.spot_id)
@@ -482,7 +707,8 @@ def release_booking(booking_id):
             booking.parking_cost = cost
 
         if spot:
-            spot.status = 'A'
+            release_spot(spot.id)
+        record_completed(booking, lot)
         db.session.commit()
         return jsonify({"message": "Booking released successfully"}), 200
     except Exception as e:
@@ -515,22 +741,18 @@ def get_user_summary(user_id):
         if start_date:
             base_query = base_query.filter(Reservation.parking_timestamp >= start_date)
         
-        # Get all reservations for analysis
-        reservations = base_query.all()
-        
-        # Generate summary data
-        summary_data = {
-            'overview': _calculate_overview(reservations),
-            'expenditureByLot': _calculate_expenditure_by_lot(reservations),
-            'timeByLot': _calculate_time_by_lot(reservations),
-            'recentSessions': _get_recent_sessions(reservations),
-            'statistics': _calculate_statistics(reservations),
-            'trends': _calculate_trends(reservations, period),
-            'period': period,
-            'dateRange': {
-                'start': start_date.isoformat() if start_date else None,
-                'end': datetime.now().isoformat()
-            }
+        if current_app.config.get('USER_SUMMARY_FROM_ROLLUPS', True):
+            # Per-day rollups plus the few active sessions, O(days) rather than O(reservations)
+            summary_data = build_summary(user_id, period, start_date)
+            recent = with_spot_and_lot(base_query).order_by(Reservation.parking_timestamp.desc()).limit(10).all()
+            summary_data['recentSessions'] = _get_recent_sessions(recent)
+        else:
+            # Load every reservation once as columns and compute all sections vectorized
+            summary_data = summarize(load_columns(user_id, start_date), period)
+        summary_data['period'] = period
+        summary_data['dateRange'] = {
+            'start': start_date.isoformat() if start_date else None,
+            'end': datetime.now().isoformat()
         }
         
         return jsonify(summary_data), 200
@@ -541,143 +763,6 @@ def get_user_summary(user_id):
         traceback.print_exc()
         return jsonify({"error": "Failed to generate summary"}), 500
 
-def _calculate_overview(reservations):
-    """Calculate overview statistics"""
-    total_expenditure = 0
-    total_hours = 0
-    total_sessions = len(reservations)
-    location_counts = {}
-    
-    for reservation in reservations:
-        # Calculate cost
-        if reservation.parking_cost:
-            total_expenditure += reservation.parking_cost
-        elif reservation.parking_timestamp and reservation.leaving_timestamp:
-            # Calculate based on duration and lot price
-            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-            if reservation.spot and reservation.spot.lot:
-                lot_price = getattr(reservation.spot.lot, 'price', 10)  # Default price
-                total_expenditure += max(1, int(duration_hours)) * lot_price
-        
-        # Calculate time
-        if reservation.parking_timestamp and reservation.leaving_timestamp:
-            duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-            total_hours += duration
-        
-        # Track favorite location
-        if reservation.spot and reservation.spot.lot:
-            lot_name = reservation.spot.lot.prime_location_name
-            location_counts[lot_name] = location_counts.get(lot_name, 0) + 1
-    
-    favorite_spot = max(location_counts.items(), key=lambda x: x[1])[0] if location_counts else None
-    
-    return {
-        'totalExpenditure': round(total_expenditure, 2),
-        'totalHours': round(total_hours, 2),
-        'totalSessions': total_sessions,
-        'favoriteSpot': favorite_spot
-    }
-
-def _calculate_expenditure_by_lot(reservations):
-    """Calculate expenditure breakdown by parking lot"""
-    lot_data = {}
-    total_spent = 0
-    
-    for reservation in reservations:
-        if not reservation.spot or not reservation.spot.lot:
-            continue
-            
-        lot = reservation.spot.lot
-        lot_key = f"{lot.id}_{lot.prime_location_name}"
-        
-        if lot_key not in lot_data:
-            lot_data[lot_key] = {
-                'lotName': lot.prime_location_name,
-                'location': lot.address,
-                'totalSpent': 0,
-                'sessions': 0
-            }
-        
-        # Calculate cost for this reservation
-        cost = 0
-        if reservation.parking_cost:
-            cost = reservation.parking_cost
-        elif reservation.parking_timestamp and reservation.leaving_timestamp:
-            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-            lot_price = getattr(lot, 'price', 10)
-            cost = max(1, int(duration_hours)) * lot_price
-        
-        lot_data[lot_key]['totalSpent'] += cost
-        lot_data[lot_key]['sessions'] += 1
-        total_spent += cost
-    
-    # Calculate percentages and averages
-    result = []
-    for lot_info in lot_data.values():
-        lot_info['avgPerSession'] = lot_info['totalSpent'] / lot_info['sessions'] if lot_info['sessions'] > 0 else 0
-        lot_info['percentage'] = (lot_info['totalSpent'] / total_spent * 100) if total_spent > 0 else 0
-        result.append(lot_info)
-    
-    # Sort by total spent descending
-    return sorted(result, key=lambda x: x['totalSpent'], reverse=True)
-
-def _calculate_time_by_lot(reservations):
-    """Calculate time spent breakdown by parking lot"""
-    lot_data = {}
-    
-    for reservation in reservations:
-        if not reservation.spot or not reservation.spot.lot:
-            continue
-        if not reservation.parking_timestamp or not reservation.leaving_timestamp:
-            continue
-            
-        lot = reservation.spot.lot
-        lot_key = f"{lot.id}_{lot.prime_location_name}"
-        
-        if lot_key not in lot_data:
-            lot_data[lot_key] = {
-                'lotName': lot.prime_location_name,
-                'totalHours': 0,
-                'sessions': 0,
-                'hourlyPattern': [0] * 24  # 24-hour usage pattern
-            }
-        
-        # Calculate duration
-        duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-        lot_data[lot_key]['totalHours'] += duration_hours
-        lot_data[lot_key]['sessions'] += 1
-        
-        # Track hourly usage pattern
-        start_hour = reservation.parking_timestamp.hour
-        lot_data[lot_key]['hourlyPattern'][start_hour] += 1
-    
-    # Calculate averages and usage patterns
-    result = []
-    for lot_info in lot_data.values():
-        if lot_info['sessions'] > 0:
-            lot_info['avgDuration'] = lot_info['totalHours'] / lot_info['sessions']
-            
-            # Determine usage pattern
-            peak_hour = lot_info['hourlyPattern'].index(max(lot_info['hourlyPattern']))
-            if 6 <= peak_hour <= 10:
-                pattern = "Morning Rush"
-            elif 11 <= peak_hour <= 15:
-                pattern = "Midday"
-            elif 16 <= peak_hour <= 20:
-                pattern = "Evening Rush"
-            else:
-                pattern = "Off-Peak"
-            
-            lot_info['usagePattern'] = pattern
-            
-            # Normalize hourly pattern for display
-            max_pattern = max(lot_info['hourlyPattern']) if max(lot_info['hourlyPattern']) > 0 else 1
-            lot_info['hourlyPattern'] = [h / max_pattern for h in lot_info['hourlyPattern']]
-            
-            result.append(lot_info)
-    
-    return sorted(result, key=lambda x: x['totalHours'], reverse=True)
-
 def _get_recent_sessions(reservations, limit=10):
     """Get recent parking sessions"""
     recent = sorted(reservations, key=lambda x: x.parking_timestamp or datetime.min, reverse=True)[:limit]
@@ -719,116 +804,6 @@ def _get_recent_sessions(reservations, limit=10):
     
     return result
 
-def _calculate_statistics(reservations):
-    """Calculate usage statistics"""
-    if not reservations:
-        return {
-            'mostActiveDay': 'N/A',
-            'peakHours': 'N/A',
-            'avgSessionLength': 0,
-            'totalSavings': 0
-        }
-    
-    # Day of week analysis
-    day_counts = [0] * 7  # Monday = 0, Sunday = 6
-    hour_counts = [0] * 24
-    total_duration = 0
-    session_count = 0
-    
-    for reservation in reservations:
-        if reservation.parking_timestamp:
-            day_counts[reservation.parking_timestamp.weekday()] += 1
-            hour_counts[reservation.parking_timestamp.hour] += 1
-            
-            if reservation.leaving_timestamp:
-                duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-                total_duration += duration
-                session_count += 1
-    
-    # Most active day
-    most_active_day_idx = day_counts.index(max(day_counts)) if max(day_counts) > 0 else 0
-    most_active_day = calendar.day_name[most_active_day_idx]
-    
-    # Peak hours
-    peak_hour = hour_counts.index(max(hour_counts)) if max(hour_counts) > 0 else 12
-    peak_hours = f"{peak_hour:02d}:00 - {(peak_hour+1)%24:02d}:00"
-    
-    # Average session length
-    avg_session_length = total_duration / session_count if session_count > 0 else 0
-    
-    # Calculate potential savings (mock calculation)
-    total_savings = len(reservations) * 2.5  # Assume $2.50 saved per session vs street parking
-    
-    return {
-        'mostActiveDay': most_active_day,
-        'peakHours': peak_hours,
-        'avgSessionLength': round(avg_session_length, 2),
-        'totalSavings': round(total_savings, 2)
-    }
-
-def _calculate_trends(reservations, period):
-    """Calculate spending and usage trends over time"""
-    if not reservations or period == 'all':
-        return []
-    
-    try:
-        days = int(period)
-    except ValueError:
-        days = 30
-    
-    # Create daily buckets
-    end_date = datetime.now().date()
-    start_date = end_date - timedelta(days=days)
-    
-    daily_data = {}
-    current_date = start_date
-    
-    # Initialize all days with zero values
-    while current_date <= end_date:
-        daily_data[current_date] = {
-            'date': current_date.isoformat(),
-            'expenditure': 0,
-            'sessions': 0,
-            'hours': 0
-        }
-        current_date += timedelta(days=1)
-    
-    # Populate with actual data
-    for reservation in reservations:
-        if not reservation.parking_timestamp:
-            continue
-            
-        date_key = reservation.parking_timestamp.date()
-        if date_key not in daily_data:
-            continue
-        
-        daily_data[date_key]['sessions'] += 1
-        
-        # Add expenditure
-        if reservation.parking_cost:
-            daily_data[date_key]['expenditure'] += reservation.parking_cost
-        elif reservation.leaving_timestamp:
-            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-            if reservation.spot and reservation.spot.lot:
-                lot_price = getattr(reservation.spot.lot, 'price', 10)
-                daily_data[date_key]['expenditure'] += max(1, int(duration_hours)) * lot_price
-        
-        # Add hours
-        if reservation.leaving_timestamp:
-            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
-            daily_data[date_key]['hours'] += duration_hours
-    
-    # Convert to list and sort by date
-    trends = list(daily_data.values())
-    trends.sort(key=lambda x: x['date'])
-    
-    # Round values
-    for trend in trends:
-        trend['expenditure'] = round(trend['expenditure'], 2)
-        trend['hours'] = round(trend['hours'], 2)
-    
-    return trends
-
 
 @routes_app.route('/api/user-summary/<int:user_id>/comparison', methods=['GET'])
 @token_required
@@ -900,6 +875,29 @@ def get_user_comparison(user_id):
         print(f"Error generating comparison: {str(e)}")
         return jsonify({"error": "Failed to generate comparison"}), 500
 
+@routes_app.route('/api/occupancy-history', methods=['GET'])
+@token_required
+def get_occupancy_history():
+    user = g.current_user
+    if not any(role.name == 'admin' for role in user.roles):
+        return jsonify({'error': 'Admin access required'}), 403
+    try:
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.now()
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=7)
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end'}), 400
+    bucket = request.args.get('bucket') or ('hour' if end - start <= timedelta(days=7) else 'day')
+    if bucket not in ('hour', 'day'):
+        return jsonify({'error': 'bucket must be hour or day'}), 400
+    lot_id = request.args.get('lot_id', type=int)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'bucket': bucket,
+        'lotId': lot_id,
+        'points': occupancy_history(start, end, bucket=bucket, lot_id=lot_id)
+    }), 200
+
 @routes_app.route('/api/admin-summary', methods=['GET'])
 @token_required
 # @cache.cached(timeout=10)
@@ -909,66 +907,8 @@ def get_admin_summary():
         return jsonify({'error': 'Admin access required'}), 403
 
     try:
-        # Revenue by lot (no period filter)
-        revenue_query = db.session.query(
-            ParkingLot.id,
-            ParkingLot.prime_location_name,
-            func.sum(Reservation.parking_cost).label('revenue')
-        ).join(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)\
-         .join(Reservation, Reservation.spot_id == ParkingSpot.id)\
-         .filter(Reservation.parking_cost.isnot(None))\
-         .group_by(ParkingLot.id, ParkingLot.prime_location_name)
-        revenue_by_lot = [
-            {
-                'lotId': row.id,
-                'lotName': row.prime_location_name,
-                'revenue': float(row.revenue or 0)
-            }
-            for row in revenue_query.all()
-        ]
-
-        lots = ParkingLot.query.all()
-        parking_lot_stats = []
-        for lot in lots:
-            spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-            total_spots = len(spots)
-            occupied_spots = sum(1 for s in spots if s.status != 'A')
-            available_spots = total_spots - occupied_spots
-            parking_lot_stats.append({
-                'lotId': lot.id,
-                'lotName': lot.prime_location_name,
-                'totalSpots': total_spots,
-                'occupiedSpots': occupied_spots,
-                'availableSpots': available_spots
-            })
-
-        total_revenue = sum(lot['revenue'] for lot in revenue_by_lot)
-        total_users = User.query.count()
-        total_sessions = Reservation.query.count()
-        active_sessions = Reservation.query.filter(Reservation.leaving_timestamp == None).count()
-        total_parking_lots = len(lots)
-        total_spots = ParkingSpot.query.count()
-
-        overview = {
-            'totalRevenue': round(total_revenue, 2),
-            'totalUsers': total_users,
-            'newUsers': 0,
-            'totalSessions': total_sessions,
-            'activeSessions': active_sessions,
-            'totalParkingLots': total_parking_lots,
-            'totalSpots': total_spots
-        }
-
-        # Daily user activity (optional, can be empty if no created_at)
-        daily_activity = []
-
-        return jsonify({
-            'overview': overview,
-            'revenueByLot': revenue_by_lot,
-            'parkingLotStats': parking_lot_stats,
-            'dailyActivity': daily_activity,
-            'paymentMethods': []
-        }), 200
+        summary = build_admin_summary(current_app.config.get('ADMIN_SUMMARY_MAX_AGE', 300))
+        return jsonify(summary), 200
 
     except Exception as e:
         print(f"Error in admin summary: {e}")
@@ -0,0 +1,149 @@
+import threading
+from .models import ParkingSpot
+
+
+class MemoryFreeSpots:
+    """Per-lot stacks of free spot ids with O(1) add, remove, pick and count"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = {}     # lot_id -> [spot_id, ...]
+        self._positions = {}  # spot_id -> index in its lot's stack
+
+    def rebuild(self, rows):
+        with self._lock:
+            self._stacks = {}
+            self._positions = {}
+            for lot_id, spot_id in rows:
+                self._push(lot_id, spot_id)
+
+    def replace_lot(self, lot_id, spot_ids):
+        with self._lock:
+            for spot_id in self._stacks.pop(lot_id, []):
+                self._positions.pop(spot_id, None)
+            for spot_id in spot_ids:
+                self._push(lot_id, spot_id)
+
+    def add(self, lot_id, spot_id):
+        with self._lock:
+            if spot_id not in self._positions:
+                self._push(lot_id, spot_id)
+
+    def remove(self, lot_id, spot_id):
+        with self._lock:
+            index = self._positions.pop(spot_id, None)
+            stack = self._stacks.get(lot_id)
+            if index is None or not stack:
+                return
+            # Swap the last entry into the hole so removal stays O(1)
+            last = stack.pop()
+            if last != spot_id:
+                stack[index] = last
+                self._positions[last] = index
+
+    def pick(self, lot_id):
+        stack = self._stacks.get(lot_id)
+        return stack[-1] if stack else None
+
+    def count(self, lot_id):
+        return len(self._stacks.get(lot_id, ()))
+
+    def _push(self, lot_id, spot_id):
+        stack = self._stacks.setdefault(lot_id, [])
+        self._positions[spot_id] = len(stack)
+        stack.append(spot_id)
+
+
+class RedisFreeSpots:
+    """Redis sets of free spot ids, shared by every web and worker process"""
+
+    def __init__(self, client, prefix='parkez:free-spots:'):
+        self._client = client
+        self._prefix = prefix
+
+    def _key(self, lot_id):
+        return f'{self._prefix}{lot_id}'
+
+    def rebuild(self, rows):
+        by_lot = {}
+        for lot_id, spot_id in rows:
+            by_lot.setdefault(lot_id, []).append(spot_id)
+        pipe = self._client.pipeline()
+        for key in self._client.scan_iter(match=f'{self._prefix}*'):
+            pipe.delete(key)
+        for lot_id, spot_ids in by_lot.items():
+            pipe.sadd(self._key(lot_id), *spot_ids)
+        pipe.execute()
+
+    def replace_lot(self, lot_id, spot_ids):
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(lot_id))
+        if spot_ids:
+            pipe.sadd(self._key(lot_id), *spot_ids)
+        pipe.execute()
+
+    def add(self, lot_id, spot_id):
+        self._client.sadd(self._key(lot_id), spot_id)
+
+    def remove(self, lot_id, spot_id):
+        self._client.srem(self._key(lot_id), spot_id)
+
+    def pick(self, lot_id):
+        spot_id = self._client.srandmember(self._key(lot_id))
+        return int(spot_id) if spot_id is not None else None
+
+    def count(self, lot_id):
+        return self._client.scard(self._key(lot_id))
+
+
+class SpotIndex:
+    """Free-spot lookup per lot, rebuilt from ParkingSpot at startup.
+
+    The index is only a hint: bookings still claim spots with a conditional
+    UPDATE, so a stale entry costs one failed claim, never a double booking.
+    Set SPOT_INDEX_BACKEND = 'redis' to share it across processes.
+    """
+
+    def __init__(self, app=None):
+        self._backend = MemoryFreeSpots()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('SPOT_INDEX_BACKEND', 'memory') == 'redis':
+            import redis
+            client = redis.Redis(
+                host=app.config.get('CACHE_REDIS_HOST', 'localhost'),
+                port=app.config.get('CACHE_REDIS_PORT', 6379),
+                db=app.config.get('SPOT_INDEX_REDIS_DB', 2)
+            )
+            self._backend = RedisFreeSpots(client)
+        else:
+            self._backend = MemoryFreeSpots()
+
+    def rebuild(self):
+        rows = ParkingSpot.query.with_entities(ParkingSpot.lot_id, ParkingSpot.id)\
+            .filter_by(status='A')\
+            .all()
+        self._backend.rebuild(rows)
+
+    def refresh_lot(self, lot_id):
+        spot_ids = [row.id for row in ParkingSpot.query.with_entities(ParkingSpot.id)
+                    .filter_by(lot_id=lot_id, status='A')
+                    .all()]
+        self._backend.replace_lot(lot_id, spot_ids)
+
+    def drop_lot(self, lot_id):
+        self._backend.replace_lot(lot_id, [])
+
+    def mark_free(self, lot_id, spot_id):
+        self._backend.add(lot_id, spot_id)
+
+    def mark_taken(self, lot_id, spot_id):
+        self._backend.remove(lot_id, spot_id)
+
+    def next_free(self, lot_id):
+        return self._backend.pick(lot_id)
+
+    def free_count(self, lot_id):
+        return self._backend.count(lot_id)
@@ -0,0 +1,285 @@
+import calendar
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.sqlite import insert
+from .models import db, ParkingLot, ParkingSpot, Reservation, UserUsageRollup
+
+ROLLUP_SUMS = ('sessions', 'cost', 'hours')
+
+
+def session_cost(reservation, lot):
+    """Cost of a finished session, falling back to hourly pricing when none was stored"""
+    if reservation.parking_cost:
+        return reservation.parking_cost
+    if lot and reservation.parking_timestamp and reservation.leaving_timestamp:
+        duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+        return max(1, int(duration_hours)) * getattr(lot, 'price', 10)
+    return 0
+
+
+def record_completed(reservation, lot):
+    """Add a just-released reservation to its user's rollup inside the caller's transaction"""
+    if not lot or not reservation.parking_timestamp or not reservation.leaving_timestamp:
+        return
+    hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+    _add_rollup(
+        user_id=reservation.user_id,
+        day=reservation.parking_timestamp.date(),
+        lot_id=lot.id,
+        start_hour=reservation.parking_timestamp.hour,
+        sessions=1,
+        cost=session_cost(reservation, lot),
+        hours=hours
+    )
+
+
+def _add_rollup(**values):
+    stmt = insert(UserUsageRollup).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'lot_id', 'start_hour'],
+        set_={name: getattr(UserUsageRollup, name) + stmt.excluded[name] for name in ROLLUP_SUMS}
+    )
+    db.session.execute(stmt)
+
+
+def rebuild_rollups(user_id=None):
+    """Recompute rollups from the reservation table for one user, or everyone"""
+    delete_query = UserUsageRollup.query
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+    delete_query.delete(synchronize_session=False)
+
+    query = db.session.query(Reservation, ParkingLot)\
+        .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+        .filter(Reservation.leaving_timestamp.isnot(None))
+    if user_id is not None:
+        query = query.filter(Reservation.user_id == user_id)
+
+    totals = {}
+    for reservation, lot in query.yield_per(1000):
+        key = (reservation.user_id, reservation.parking_timestamp.date(), lot.id, reservation.parking_timestamp.hour)
+        row = totals.setdefault(key, [0, 0, 0])
+        row[0] += 1
+        row[1] += session_cost(reservation, lot)
+        row[2] += (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+
+    db.session.bulk_insert_mappings(UserUsageRollup, [
+        {
+            'user_id': key[0], 'day': key[1], 'lot_id': key[2], 'start_hour': key[3],
+            'sessions': row[0], 'cost': row[1], 'hours': row[2]
+        }
+        for key, row in totals.items()
+    ])
+    db.session.flush()
+    return len(totals)
+
+
+def rollups_missing():
+    """True when released reservations exist but no rollup has been built yet"""
+    if db.session.query(UserUsageRollup.user_id).first():
+        return False
+    return db.session.query(Reservation.id).filter(Reservation.leaving_timestamp.isnot(None)).first() is not None
+
+
+def build_summary(user_id, period, start_date):
+    """Summary sections for /api/user-summary assembled from rollups plus the user's active sessions"""
+    rollups = db.session.query(
+        UserUsageRollup.day,
+        UserUsageRollup.start_hour,
+        UserUsageRollup.sessions,
+        UserUsageRollup.cost,
+        UserUsageRollup.hours,
+        ParkingLot.id,
+        ParkingLot.prime_location_name,
+        ParkingLot.address
+    ).join(ParkingLot, ParkingLot.id == UserUsageRollup.lot_id)\
+     .filter(UserUsageRollup.user_id == user_id)
+
+    # Rollups are hourly, so the hour containing start_date is only partly in
+    # range; those few sessions are read from Reservation instead
+    boundary = db.session.query(Reservation, ParkingLot)\
+        .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+        .filter(Reservation.user_id == user_id, Reservation.leaving_timestamp.isnot(None))
+    if start_date:
+        start_day = start_date.date()
+        next_hour = start_date.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        rollups = rollups.filter(or_(
+            UserUsageRollup.day > start_day,
+            and_(UserUsageRollup.day == start_day, UserUsageRollup.start_hour > start_date.hour)
+        ))
+        boundary = boundary.filter(
+            Reservation.parking_timestamp >= start_date,
+            Reservation.parking_timestamp < next_hour
+        ).all()
+    else:
+        boundary = []
+
+    active = db.session.query(Reservation.parking_timestamp, ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.address)\
+        .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)\
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+        .filter(Reservation.user_id == user_id, Reservation.leaving_timestamp.is_(None))
+    if start_date:
+        active = active.filter(Reservation.parking_timestamp >= start_date)
+
+    lots = {}
+    days = {}
+    day_counts = [0] * 7
+    hour_counts = [0] * 24
+    total_cost = 0
+    total_hours = 0
+    completed_sessions = 0
+    active_sessions = 0
+
+    def lot_entry(lot_id, name, address):
+        return lots.setdefault(lot_id, {
+            'name': name, 'address': address, 'sessions': 0, 'completed': 0,
+            'cost': 0, 'hours': 0, 'hourlyPattern': [0] * 24
+        })
+
+    def day_entry(day):
+        return days.setdefault(day, {'expenditure': 0, 'sessions': 0, 'hours': 0})
+
+    rows = rollups.all()
+    for reservation, lot in boundary:
+        rows.append((
+            reservation.parking_timestamp.date(),
+            reservation.parking_timestamp.hour,
+            1,
+            session_cost(reservation, lot),
+            (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600,
+            lot.id,
+            lot.prime_location_name,
+            lot.address
+        ))
+
+    for day, start_hour, sessions, cost, hours, lot_id, name, address in rows:
+        lot = lot_entry(lot_id, name, address)
+        lot['sessions'] += sessions
+        lot['completed'] += sessions
+        lot['cost'] += cost
+        lot['hours'] += hours
+        lot['hourlyPattern'][start_hour] += sessions
+        bucket = day_entry(day)
+        bucket['expenditure'] += cost
+        bucket['sessions'] += sessions
+        bucket['hours'] += hours
+        day_counts[day.weekday()] += sessions
+        hour_counts[start_hour] += sessions
+        total_cost += cost
+        total_hours += hours
+        completed_sessions += sessions
+
+    for parking_timestamp, lot_id, name, address in active.all():
+        lot_entry(lot_id, name, address)['sessions'] += 1
+        day_entry(parking_timestamp.date())['sessions'] += 1
+        day_counts[parking_timestamp.weekday()] += 1
+        hour_counts[parking_timestamp.hour] += 1
+        active_sessions += 1
+
+    total_sessions = completed_sessions + active_sessions
+    return {
+        'overview': _overview(lots, total_cost, total_hours, total_sessions),
+        'expenditureByLot': _expenditure_by_lot(lots, total_cost),
+        'timeByLot': _time_by_lot(lots),
+        'statistics': _statistics(day_counts, hour_counts, total_hours, completed_sessions, total_sessions),
+        'trends': _trends(days, period) if total_sessions else []
+    }
+
+
+def _overview(lots, total_cost, total_hours, total_sessions):
+    # Counted by lot name, as the per-reservation summary did, so same-named lots add up
+    sessions_by_name = {}
+    for lot in lots.values():
+        sessions_by_name[lot['name']] = sessions_by_name.get(lot['name'], 0) + lot['sessions']
+    favorite = max(sessions_by_name.items(), key=lambda x: x[1])[0] if sessions_by_name else None
+    return {
+        'totalExpenditure': round(total_cost, 2),
+        'totalHours': round(total_hours, 2),
+        'totalSessions': total_sessions,
+        'favoriteSpot': favorite
+    }
+
+
+def _expenditure_by_lot(lots, total_cost):
+    result = []
+    for lot in lots.values():
+        result.append({
+            'lotName': lot['name'],
+            'location': lot['address'],
+            'totalSpent': lot['cost'],
+            'sessions': lot['sessions'],
+            'avgPerSession': lot['cost'] / lot['sessions'] if lot['sessions'] > 0 else 0,
+            'percentage': (lot['cost'] / total_cost * 100) if total_cost > 0 else 0
+        })
+    return sorted(result, key=lambda x: x['totalSpent'], reverse=True)
+
+
+def _time_by_lot(lots):
+    result = []
+    for lot in lots.values():
+        if not lot['completed']:
+            continue
+        pattern = lot['hourlyPattern']
+        peak_hour = pattern.index(max(pattern))
+        if 6 <= peak_hour <= 10:
+            usage = "Morning Rush"
+        elif 11 <= peak_hour <= 15:
+            usage = "Midday"
+        elif 16 <= peak_hour <= 20:
+            usage = "Evening Rush"
+        else:
+            usage = "Off-Peak"
+        max_pattern = max(pattern) if max(pattern) > 0 else 1
+        result.append({
+            'lotName': lot['name'],
+            'totalHours': lot['hours'],
+            'sessions': lot['completed'],
+            'hourlyPattern': [h / max_pattern for h in pattern],
+            'avgDuration': lot['hours'] / lot['completed'],
+            'usagePattern': usage
+        })
+    return sorted(result, key=lambda x: x['totalHours'], reverse=True)
+
+
+def _statistics(day_counts, hour_counts, total_hours, completed_sessions, total_sessions):
+    if not total_sessions:
+        return {
+            'mostActiveDay': 'N/A',
+            'peakHours': 'N/A',
+            'avgSessionLength': 0,
+            'totalSavings': 0
+        }
+    most_active_day_idx = day_counts.index(max(day_counts)) if max(day_counts) > 0 else 0
+    peak_hour = hour_counts.index(max(hour_counts)) if max(hour_counts) > 0 else 12
+    avg_session_length = total_hours / completed_sessions if completed_sessions > 0 else 0
+    return {
+        'mostActiveDay': calendar.day_name[most_active_day_idx],
+        'peakHours': f"{peak_hour:02d}:00 - {(peak_hour+1)%24:02d}:00",
+        'avgSessionLength': round(avg_session_length, 2),
+        'totalSavings': round(total_sessions * 2.5, 2)
+    }
+
+
+def _trends(days, period):
+    if period == 'all':
+        return []
+    try:
+        span = int(period)
+    except ValueError:
+        span = 30
+
+    end_date = datetime.now().date()
+    current_date = end_date - timedelta(days=span)
+    trends = []
+    while current_date <= end_date:
+        bucket = days.get(current_date, {'expenditure': 0, 'sessions': 0, 'hours': 0})
+        trends.append({
+            'date': current_date.isoformat(),
+            'expenditure': round(bucket['expenditure'], 2),
+            'sessions': bucket['sessions'],
+            'hours': round(bucket['hours'], 2)
+        })
+        current_date += timedelta(days=1)
+    return trends
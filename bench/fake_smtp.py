@@ -0,0 +1,124 @@
+"""A local fake SMTP server for mail throughput and failure tests.
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP,
+QUIT), keeps counts of connections and accepted messages, and can inject the
+failures Mailer has to survive:
+
+    latency       seconds slept before every reply, standing in for network round trips
+    max_messages  reply 421 and hang up once a connection has taken this many messages
+    drop_every    hang up right after accepting every Nth message
+    refuse        recipients containing this text get 550
+
+Run standalone to point a development worker at it:
+
+    python bench/fake_smtp.py --port 1025 --latency 0.002
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, max_messages=None, drop_every=None, refuse=None):
+        super().__init__((host, port), _Session)
+        self.latency = latency
+        self.max_messages = max_messages
+        self.drop_every = drop_every
+        self.refuse = refuse.lower().encode() if refuse else None
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.accepted = 0
+        self.recipients = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve on a daemon thread; returns self for chaining"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset_counts(self):
+        with self.lock:
+            self.connections = 0
+            self.accepted = 0
+            self.recipients = []
+
+
+class _Session(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        on_connection = 0
+        recipients = []
+        self.reply(b'220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().upper()
+            if command.startswith((b'EHLO', b'HELO')):
+                self.reply(b'250-fake-smtp\r\n250 OK')
+            elif command.startswith(b'MAIL'):
+                recipients = []
+                self.reply(b'250 OK')
+            elif command.startswith(b'RCPT'):
+                if server.refuse and server.refuse in command.lower():
+                    self.reply(b'550 No such user')
+                else:
+                    recipients.append(line.strip()[8:].strip(b'<>').decode())
+                    self.reply(b'250 OK')
+            elif command.startswith(b'DATA'):
+                if server.max_messages and on_connection >= server.max_messages:
+                    self.reply(b'421 Too many messages on this connection')
+                    return
+                self.reply(b'354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                on_connection += 1
+                with server.lock:
+                    server.accepted += 1
+                    server.recipients.extend(recipients)
+                    accepted = server.accepted
+                self.reply(b'250 OK queued')
+                if server.drop_every and accepted % server.drop_every == 0:
+                    # The client only finds out on its next command
+                    return
+            elif command.startswith(b'QUIT'):
+                self.reply(b'221 Bye')
+                return
+            else:
+                self.reply(b'250 OK')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--max-messages', type=int)
+    parser.add_argument('--drop-every', type=int)
+    parser.add_argument('--refuse')
+    args = parser.parse_args()
+    server = FakeSMTPServer(args.host, args.port, args.latency, args.max_messages, args.drop_every, args.refuse)
+    print(f'Fake SMTP server on {args.host}:{server.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Shared setup for the benchmark scripts: a scratch database and bulk seeding"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_BATCH_SIZE = 50000
+
+
+def load_app(db_path=None):
+    """Import the app against db_path (a fresh temp file by default) with an in-process cache.
+
+    app.py builds the app at import time, so this must run before anything
+    imports it.
+    """
+    from backend import config
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='parkez-bench-'), 'bench.sqlite3')
+    config.LocalDevelopmentConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath(db_path)}'
+    config.LocalDevelopmentConfig.CACHE_TYPE = 'SimpleCache'
+    config.LocalDevelopmentConfig.DEBUG = False
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    return app_module.app
+
+
+def seed_lots(count, spots_per_lot, price=10, pincode='500001'):
+    """Insert lots with all-free spots and their counters; returns the new lot ids"""
+    from sqlalchemy import insert, select, func
+    from backend.models import db, ParkingLot, ParkingSpot, LotOccupancy
+    first = (db.session.query(func.max(ParkingLot.id)).scalar() or 0) + 1
+    lot_ids = list(range(first, first + count))
+    db.session.execute(insert(ParkingLot), [{
+        'id': lot_id,
+        'prime_location_name': f'Bench Lot {lot_id}',
+        'price': price + lot_id % 7,
+        'address': f'{lot_id} Bench Road',
+        'pincode': pincode,
+        'number_of_spots': spots_per_lot
+    } for lot_id in lot_ids])
+    spots = [{'lot_id': lot_id, 'status': 'A'} for lot_id in lot_ids for _ in range(spots_per_lot)]
+    for i in range(0, len(spots), SEED_BATCH_SIZE):
+        db.session.execute(insert(ParkingSpot), spots[i:i + SEED_BATCH_SIZE])
+    db.session.execute(insert(LotOccupancy).from_select(
+        ['lot_id', 'available_spots', 'occupied_spots'],
+        select(ParkingSpot.lot_id, func.count(ParkingSpot.id), 0)
+        .where(ParkingSpot.lot_id >= first)
+        .group_by(ParkingSpot.lot_id)
+    ))
+    db.session.commit()
+    return lot_ids
+
+
+def seed_reservations(count, user_ids, spot_ids, days=60, seed=1, active_share=0.05):
+    """Insert count reservations spread over the last `days` days, in batches"""
+    from sqlalchemy import insert
+    from backend.models import db, Reservation
+    rng = random.Random(seed)
+    now = datetime.now()
+    batch = []
+    for i in range(count):
+        start = now - timedelta(days=rng.randint(1, days), minutes=rng.randint(0, 1439))
+        done = rng.random() >= active_share
+        batch.append({
+            'spot_id': rng.choice(spot_ids),
+            'user_id': rng.choice(user_ids),
+            'vehicle_number': f'BN{i % 10000:04d}',
+            'parking_timestamp': start,
+            'leaving_timestamp': start + timedelta(minutes=rng.randint(10, 600)) if done else None,
+            'parking_cost': rng.choice([None, 0, 25.0, 40.0]) if done else None
+        })
+        if len(batch) >= SEED_BATCH_SIZE:
+            db.session.execute(insert(Reservation), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Reservation), batch)
+    db.session.commit()
+
+
+def median_ms(fn, repeat=5):
+    """Median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
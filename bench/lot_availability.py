@@ -0,0 +1,64 @@
+"""Latency of GET /api/parkinglots as the lot count grows.
+
+Compares the per-lot COUNT loop the endpoint used to run with the current
+read path (occupancy counters joined to the lots in one query), and times the
+endpoint itself with its cache cleared before every request.
+
+    python bench/lot_availability.py [--lots 10 100 1000 10000] [--spots 10]
+
+The old loop scans the spot table once per lot, so it is skipped above
+--old-max lots (1000 by default) to keep the run short.
+"""
+import argparse
+from harness import load_app, seed_lots, median_ms
+
+
+def per_lot_counts():
+    # The endpoint before the occupancy counters: one COUNT per lot
+    from backend.models import ParkingLot, ParkingSpot
+    rows = []
+    for lot in ParkingLot.query.all():
+        available = ParkingSpot.query.filter_by(lot_id=lot.id, status='A').count()
+        rows.append((lot, available))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lots', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--spots', type=int, default=10, help='spots per lot')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--old-max', type=int, default=1000, help='largest lot count to time the old loop at')
+    args = parser.parse_args()
+
+    app = load_app()
+    from backend.extensions import cache
+    from backend.models import db, ParkingLot
+    from backend.routes import _lot_availability
+    client = app.test_client()
+
+    def endpoint():
+        cache.clear()
+        res = client.get('/api/parkinglots')
+        assert res.status_code == 200
+
+    print(f"{'lots':>7} {'per-lot COUNT ms':>17} {'grouped read ms':>16} {'endpoint ms':>12} {'same counts':>12}", flush=True)
+    with app.app_context():
+        for target in sorted(args.lots):
+            existing = db.session.query(ParkingLot).count()
+            if target > existing:
+                seed_lots(target - existing, args.spots)
+            db.session.expire_all()
+            new_ms = median_ms(_lot_availability, args.repeat)
+            endpoint_ms = median_ms(endpoint, args.repeat)
+            if target <= args.old_max:
+                old = {lot.id: available for lot, available in per_lot_counts()}
+                new = {lot.id: available for lot, available, _ in _lot_availability()}
+                old_ms, same = f'{median_ms(per_lot_counts, args.repeat):.1f}', str(old == new)
+            else:
+                old_ms = same = '-'
+            print(f"{target:>7} {old_ms:>17} {new_ms:>16.1f} {endpoint_ms:>12.1f} {same:>12}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Messages per second through backend.celery.mail_service against bench/fake_smtp.py.
+
+Compares one connection per message (what send_email does) with send_many's
+pooled connections, then replays send_many with injected failures and checks
+every message is delivered exactly once.
+
+    python bench/mail_throughput.py [--messages 1000] [--latency 0.001]
+"""
+import argparse
+import logging
+import time
+from harness import ROOT  # noqa: F401  (puts the repo on sys.path)
+from fake_smtp import FakeSMTPServer
+from backend.celery.mail_service import Mailer, send_many, MAX_MESSAGES_PER_CONNECTION
+
+HOST = '127.0.0.1'
+
+
+def messages(count, refuse_every=None):
+    for i in range(count):
+        bad = refuse_every and i % refuse_every == 0
+        yield f"{'bad' if bad else 'user'}{i}@example.com", 'Parking reminder', f'<p>Reminder {i}</p>'
+
+
+def one_connection_each(port, count):
+    sent = 0
+    for to, subject, content in messages(count):
+        with Mailer(host=HOST, port=port) as mailer:
+            sent += mailer.send(to, subject, content)
+    return sent
+
+
+def run(label, server, count, send):
+    server.reset_counts()
+    began = time.perf_counter()
+    sent = send()
+    elapsed = time.perf_counter() - began
+    duplicates = len(server.recipients) - len(set(server.recipients))
+    print(f'{label:<44} {sent:>6} {server.accepted:>9} {duplicates:>5} {server.connections:>6} '
+          f'{count / elapsed:>9.0f}')
+    return sent, server.accepted, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds per SMTP reply')
+    args = parser.parse_args()
+    count = args.messages
+    # Retries and refusals log per message; keep the table readable
+    logging.getLogger('backend.celery.mail_service').setLevel(logging.CRITICAL)
+
+    print(f'{count} messages, {args.latency * 1000:.1f} ms per reply, '
+          f'{MAX_MESSAGES_PER_CONNECTION} messages per pooled connection')
+    print(f"{'scenario':<44} {'sent':>6} {'accepted':>9} {'dups':>5} {'conns':>6} {'msgs/s':>9}")
+
+    server = FakeSMTPServer(HOST, latency=args.latency).start()
+    run('one connection per message', server, count, lambda: one_connection_each(server.port, count))
+    sent, accepted, dups = run('send_many', server, count,
+                               lambda: send_many(messages(count), host=HOST, port=server.port))
+    assert sent == accepted == count and not dups
+    server.shutdown()
+
+    server = FakeSMTPServer(HOST, latency=args.latency, max_messages=40, drop_every=97).start()
+    sent, accepted, dups = run('send_many, 421 after 40 and a drop every 97', server, count,
+                               lambda: send_many(messages(count), host=HOST, port=server.port))
+    assert sent == accepted == count and not dups
+    server.shutdown()
+
+    server = FakeSMTPServer(HOST, latency=args.latency, refuse='bad').start()
+    sent, accepted, dups = run('send_many, 1 in 50 recipients refused', server, count,
+                               lambda: send_many(messages(count, refuse_every=50), host=HOST, port=server.port))
+    assert sent == accepted == count - len(range(0, count, 50)) and not dups
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
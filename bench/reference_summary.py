@@ -0,0 +1,312 @@
+"""The per-reservation user-summary helpers as they were before backend/analytics.py.
+
+Kept verbatim as the reference that bench/user_summary.py times and checks the
+columnar engine against.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+
+def summarize(reservations, period):
+    return {
+        'overview': _calculate_overview(reservations),
+        'expenditureByLot': _calculate_expenditure_by_lot(reservations),
+        'timeByLot': _calculate_time_by_lot(reservations),
+        'recentSessions': _get_recent_sessions(reservations),
+        'statistics': _calculate_statistics(reservations),
+        'trends': _calculate_trends(reservations, period),
+    }
+
+
+def _calculate_overview(reservations):
+    """Calculate overview statistics"""
+    total_expenditure = 0
+    total_hours = 0
+    total_sessions = len(reservations)
+    location_counts = {}
+
+    for reservation in reservations:
+        # Calculate cost
+        if reservation.parking_cost:
+            total_expenditure += reservation.parking_cost
+        elif reservation.parking_timestamp and reservation.leaving_timestamp:
+            # Calculate based on duration and lot price
+            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            if reservation.spot and reservation.spot.lot:
+                lot_price = getattr(reservation.spot.lot, 'price', 10)  # Default price
+                total_expenditure += max(1, int(duration_hours)) * lot_price
+
+        # Calculate time
+        if reservation.parking_timestamp and reservation.leaving_timestamp:
+            duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            total_hours += duration
+
+        # Track favorite location
+        if reservation.spot and reservation.spot.lot:
+            lot_name = reservation.spot.lot.prime_location_name
+            location_counts[lot_name] = location_counts.get(lot_name, 0) + 1
+
+    favorite_spot = max(location_counts.items(), key=lambda x: x[1])[0] if location_counts else None
+
+    return {
+        'totalExpenditure': round(total_expenditure, 2),
+        'totalHours': round(total_hours, 2),
+        'totalSessions': total_sessions,
+        'favoriteSpot': favorite_spot
+    }
+
+
+def _calculate_expenditure_by_lot(reservations):
+    """Calculate expenditure breakdown by parking lot"""
+    lot_data = {}
+    total_spent = 0
+
+    for reservation in reservations:
+        if not reservation.spot or not reservation.spot.lot:
+            continue
+
+        lot = reservation.spot.lot
+        lot_key = f"{lot.id}_{lot.prime_location_name}"
+
+        if lot_key not in lot_data:
+            lot_data[lot_key] = {
+                'lotName': lot.prime_location_name,
+                'location': lot.address,
+                'totalSpent': 0,
+                'sessions': 0
+            }
+
+        # Calculate cost for this reservation
+        cost = 0
+        if reservation.parking_cost:
+            cost = reservation.parking_cost
+        elif reservation.parking_timestamp and reservation.leaving_timestamp:
+            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            lot_price = getattr(lot, 'price', 10)
+            cost = max(1, int(duration_hours)) * lot_price
+
+        lot_data[lot_key]['totalSpent'] += cost
+        lot_data[lot_key]['sessions'] += 1
+        total_spent += cost
+
+    # Calculate percentages and averages
+    result = []
+    for lot_info in lot_data.values():
+        lot_info['avgPerSession'] = lot_info['totalSpent'] / lot_info['sessions'] if lot_info['sessions'] > 0 else 0
+        lot_info['percentage'] = (lot_info['totalSpent'] / total_spent * 100) if total_spent > 0 else 0
+        result.append(lot_info)
+
+    # Sort by total spent descending
+    return sorted(result, key=lambda x: x['totalSpent'], reverse=True)
+
+
+def _calculate_time_by_lot(reservations):
+    """Calculate time spent breakdown by parking lot"""
+    lot_data = {}
+
+    for reservation in reservations:
+        if not reservation.spot or not reservation.spot.lot:
+            continue
+        if not reservation.parking_timestamp or not reservation.leaving_timestamp:
+            continue
+
+        lot = reservation.spot.lot
+        lot_key = f"{lot.id}_{lot.prime_location_name}"
+
+        if lot_key not in lot_data:
+            lot_data[lot_key] = {
+                'lotName': lot.prime_location_name,
+                'totalHours': 0,
+                'sessions': 0,
+                'hourlyPattern': [0] * 24  # 24-hour usage pattern
+            }
+
+        # Calculate duration
+        duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+        lot_data[lot_key]['totalHours'] += duration_hours
+        lot_data[lot_key]['sessions'] += 1
+
+        # Track hourly usage pattern
+        start_hour = reservation.parking_timestamp.hour
+        lot_data[lot_key]['hourlyPattern'][start_hour] += 1
+
+    # Calculate averages and usage patterns
+    result = []
+    for lot_info in lot_data.values():
+        if lot_info['sessions'] > 0:
+            lot_info['avgDuration'] = lot_info['totalHours'] / lot_info['sessions']
+
+            # Determine usage pattern
+            peak_hour = lot_info['hourlyPattern'].index(max(lot_info['hourlyPattern']))
+            if 6 <= peak_hour <= 10:
+                pattern = "Morning Rush"
+            elif 11 <= peak_hour <= 15:
+                pattern = "Midday"
+            elif 16 <= peak_hour <= 20:
+                pattern = "Evening Rush"
+            else:
+                pattern = "Off-Peak"
+
+            lot_info['usagePattern'] = pattern
+
+            # Normalize hourly pattern for display
+            max_pattern = max(lot_info['hourlyPattern']) if max(lot_info['hourlyPattern']) > 0 else 1
+            lot_info['hourlyPattern'] = [h / max_pattern for h in lot_info['hourlyPattern']]
+
+            result.append(lot_info)
+
+    return sorted(result, key=lambda x: x['totalHours'], reverse=True)
+
+
+def _get_recent_sessions(reservations, limit=10):
+    """Get recent parking sessions"""
+    recent = sorted(reservations, key=lambda x: x.parking_timestamp or datetime.min, reverse=True)[:limit]
+
+    result = []
+    for reservation in recent:
+        if not reservation.spot or not reservation.spot.lot:
+            continue
+        lot = reservation.spot.lot
+        # Calculate duration and cost
+        duration = 0
+        cost = 0
+        status = 'active'
+
+        if reservation.leaving_timestamp:
+            duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            status = 'completed'
+        elif reservation.parking_timestamp:
+            duration = (datetime.now() - reservation.parking_timestamp).total_seconds() / 3600
+
+        if reservation.parking_cost:
+            cost = reservation.parking_cost
+        elif duration > 0:
+            lot_price = getattr(lot, 'price', 10)
+            cost = max(1, int(duration)) * lot_price
+
+        result.append({
+            'id': reservation.id,
+            'lotName': lot.prime_location_name,
+            'lotAddress': lot.address,
+            'lotPincode': lot.pincode,
+            'startTime': reservation.parking_timestamp.isoformat() if reservation.parking_timestamp else None,
+            'endTime': reservation.leaving_timestamp.isoformat() if reservation.leaving_timestamp else None,
+            'duration': round(duration, 2),
+            'cost': round(cost, 2),
+            'status': status,
+            'vehicleNumber': getattr(reservation, 'vehicle_number', '')
+        })
+
+    return result
+
+
+def _calculate_statistics(reservations):
+    """Calculate usage statistics"""
+    if not reservations:
+        return {
+            'mostActiveDay': 'N/A',
+            'peakHours': 'N/A',
+            'avgSessionLength': 0,
+            'totalSavings': 0
+        }
+
+    # Day of week analysis
+    day_counts = [0] * 7  # Monday = 0, Sunday = 6
+    hour_counts = [0] * 24
+    total_duration = 0
+    session_count = 0
+
+    for reservation in reservations:
+        if reservation.parking_timestamp:
+            day_counts[reservation.parking_timestamp.weekday()] += 1
+            hour_counts[reservation.parking_timestamp.hour] += 1
+
+            if reservation.leaving_timestamp:
+                duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+                total_duration += duration
+                session_count += 1
+
+    # Most active day
+    most_active_day_idx = day_counts.index(max(day_counts)) if max(day_counts) > 0 else 0
+    most_active_day = calendar.day_name[most_active_day_idx]
+
+    # Peak hours
+    peak_hour = hour_counts.index(max(hour_counts)) if max(hour_counts) > 0 else 12
+    peak_hours = f"{peak_hour:02d}:00 - {(peak_hour+1)%24:02d}:00"
+
+    # Average session length
+    avg_session_length = total_duration / session_count if session_count > 0 else 0
+
+    # Calculate potential savings (mock calculation)
+    total_savings = len(reservations) * 2.5  # Assume $2.50 saved per session vs street parking
+
+    return {
+        'mostActiveDay': most_active_day,
+        'peakHours': peak_hours,
+        'avgSessionLength': round(avg_session_length, 2),
+        'totalSavings': round(total_savings, 2)
+    }
+
+
+def _calculate_trends(reservations, period):
+    """Calculate spending and usage trends over time"""
+    if not reservations or period == 'all':
+        return []
+
+    try:
+        days = int(period)
+    except ValueError:
+        days = 30
+
+    # Create daily buckets
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+
+    daily_data = {}
+    current_date = start_date
+
+    # Initialize all days with zero values
+    while current_date <= end_date:
+        daily_data[current_date] = {
+            'date': current_date.isoformat(),
+            'expenditure': 0,
+            'sessions': 0,
+            'hours': 0
+        }
+        current_date += timedelta(days=1)
+
+    # Populate with actual data
+    for reservation in reservations:
+        if not reservation.parking_timestamp:
+            continue
+
+        date_key = reservation.parking_timestamp.date()
+        if date_key not in daily_data:
+            continue
+
+        daily_data[date_key]['sessions'] += 1
+
+        # Add expenditure
+        if reservation.parking_cost:
+            daily_data[date_key]['expenditure'] += reservation.parking_cost
+        elif reservation.leaving_timestamp:
+            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            if reservation.spot and reservation.spot.lot:
+                lot_price = getattr(reservation.spot.lot, 'price', 10)
+                daily_data[date_key]['expenditure'] += max(1, int(duration_hours)) * lot_price
+
+        # Add hours
+        if reservation.leaving_timestamp:
+            duration_hours = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600
+            daily_data[date_key]['hours'] += duration_hours
+
+    # Convert to list and sort by date
+    trends = list(daily_data.values())
+    trends.sort(key=lambda x: x['date'])
+
+    # Round values
+    for trend in trends:
+        trend['expenditure'] = round(trend['expenditure'], 2)
+        trend['hours'] = round(trend['hours'], 2)
+
+    return trends
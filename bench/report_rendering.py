@@ -0,0 +1,89 @@
+"""Monthly report renders per second, by bookings per report.
+
+Times Flask's render_template inside one app context (how the task rendered
+before report_renderer), the precompiled template rendering in-process, and
+the same with a process pool, and checks all three produce the same HTML.
+
+    python bench/report_rendering.py [--bookings 1 10 100 500] [--reports 200] [--processes 4]
+"""
+import argparse
+import os
+import time
+from harness import load_app
+
+MONTH_NAME = 'March 2026'
+
+
+def make_report(user_id, booking_count):
+    bookings = [{
+        'id': user_id * 1000 + i,
+        'lot_name': f'Lot {i % 7}',
+        'spot_id': 100 + i % 40,
+        'date': f'2026-03-{1 + i % 28:02d}',
+        'cost': 25.0 + i % 5
+    } for i in range(booking_count)]
+    return {
+        'user_id': user_id,
+        'email': f'user{user_id}@example.com',
+        'user_name': f'User {user_id}',
+        'total_bookings': booking_count,
+        'total_amount': sum(b['cost'] for b in bookings),
+        'most_used_lot': 'Lot 0',
+        'bookings': bookings
+    }
+
+
+def rate(count, fn):
+    began = time.perf_counter()
+    result = fn()
+    return count / (time.perf_counter() - began), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--reports', type=int, default=200, help='reports per batch')
+    parser.add_argument('--processes', type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    app = load_app()
+    from flask import render_template
+    from backend.celery.report_renderer import render_reports, TEMPLATE_NAME
+
+    def flask_render(reports):
+        return [render_template(
+            TEMPLATE_NAME,
+            user_name=report['user_name'],
+            month_name=MONTH_NAME,
+            total_bookings=report['total_bookings'],
+            total_amount=report['total_amount'],
+            most_used_lot=report['most_used_lot'],
+            bookings=report['bookings']
+        ) for report in reports]
+
+    pool_label = f'pool x{args.processes} /s'
+    print(f"{'bookings':>8} {'render_template /s':>19} {'precompiled /s':>15} {pool_label:>15} {'same html':>10}")
+    with app.app_context():
+        # Warm both template caches and the pool so the first row is not compile time
+        warm = [make_report(0, 1)] * 2
+        flask_render(warm)
+        render_reports(MONTH_NAME, warm, 0)
+        if args.processes > 1:
+            render_reports(MONTH_NAME, warm, args.processes)
+
+        for booking_count in args.bookings:
+            reports = [make_report(user_id, booking_count) for user_id in range(1, args.reports + 1)]
+            old_rate, old = rate(len(reports), lambda: flask_render(reports))
+            new_rate, new = rate(len(reports), lambda: render_reports(MONTH_NAME, reports, 0))
+            same = old == new
+            if args.processes > 1:
+                pool_rate, pooled = rate(len(reports), lambda: render_reports(MONTH_NAME, reports, args.processes))
+                same = same and pooled == new
+                pool_cell = f'{pool_rate:.0f}'
+            else:
+                pool_cell = '-'
+            print(f'{booking_count:>8} {old_rate:>19.0f} {new_rate:>15.0f} {pool_cell:>15} {str(same):>10}')
+
+
+if __name__ == '__main__':
+    main()
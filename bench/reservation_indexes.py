@@ -0,0 +1,129 @@
+"""EXPLAIN QUERY PLAN and timings of the hot Reservation queries, before and after the index migrations.
+
+Seeds a reservation table (10M rows by default), drops the reservation
+indexes and their statistics to stand in for a pre-migration database, records
+each query's plan and median time, then applies the migrations with
+backend.migrations.upgrade() and records them again.
+
+    python bench/reservation_indexes.py [--rows 10000000] [--db path.sqlite3]
+
+Seeding 10M rows takes several minutes and about 1 GB of disk. Pass --db
+to keep the seeded database, and run again with the same --db to skip seeding.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from harness import load_app, seed_lots, seed_reservations, median_ms
+
+RESERVATION_INDEXES = (
+    'ix_reservation_user_parked',
+    'ix_reservation_spot_parked',
+    'ix_reservation_active',
+    'ix_reservation_left',
+)
+
+# (name, sql) with parameters filled from the seeded data
+QUERIES = [
+    ('user bookings in a day (reminders, monthly reports)',
+     'SELECT id, parking_timestamp FROM reservation '
+     'WHERE user_id = :user_id AND parking_timestamp >= :day_start AND parking_timestamp < :day_end'),
+    ('user history, newest page',
+     'SELECT id, parking_timestamp FROM reservation WHERE user_id = :user_id '
+     'ORDER BY parking_timestamp DESC, id DESC LIMIT 20'),
+    ('latest reservation of a spot (get_spot_details)',
+     'SELECT id, parking_timestamp FROM reservation WHERE spot_id = :spot_id '
+     'ORDER BY parking_timestamp DESC LIMIT 1'),
+    ("user's active sessions",
+     'SELECT id FROM reservation WHERE user_id = :user_id AND leaving_timestamp IS NULL'),
+    ('active sessions (admin summary)',
+     'SELECT count(*) FROM reservation WHERE leaving_timestamp IS NULL'),
+    ('released in the last 5 minutes (occupancy samples)',
+     'SELECT count(*), sum(parking_cost) FROM reservation '
+     'WHERE leaving_timestamp > :since AND leaving_timestamp <= :now'),
+]
+
+
+def parameters(db):
+    from sqlalchemy import text
+    user_id, parked = db.session.execute(text(
+        'SELECT user_id, parking_timestamp FROM reservation WHERE id = '
+        '(SELECT max(id) / 2 FROM reservation)'
+    )).one()
+    spot_id = db.session.execute(text('SELECT spot_id FROM reservation ORDER BY id LIMIT 1')).scalar()
+    day_start = datetime.fromisoformat(str(parked)).replace(hour=0, minute=0, second=0, microsecond=0)
+    last_left = db.session.execute(text('SELECT max(leaving_timestamp) FROM reservation')).scalar()
+    now = datetime.fromisoformat(str(last_left))
+    return {
+        'user_id': user_id,
+        'spot_id': spot_id,
+        'day_start': day_start,
+        'day_end': day_start + timedelta(days=1),
+        'since': now - timedelta(minutes=5),
+        'now': now,
+    }
+
+
+def report(db, label, params, repeat):
+    from sqlalchemy import text
+    print(f'\n== {label} ==')
+    timings = []
+    for name, sql in QUERIES:
+        plan = [row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)]
+        elapsed = median_ms(lambda: db.session.execute(text(sql), params).all(), repeat)
+        timings.append(elapsed)
+        print(f'{name}: {elapsed:.2f} ms')
+        for step in plan:
+            print(f'    {step}')
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--db', help='database file to seed or reuse (default: a temp file)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    reuse = bool(args.db) and os.path.exists(args.db)
+    app = load_app(args.db)
+    from sqlalchemy import text
+    from backend.models import db, ParkingSpot
+    from backend.migrations import upgrade
+
+    with app.app_context():
+        # Start from the pre-migration schema: no reservation indexes, no statistics
+        for name in RESERVATION_INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        if db.session.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+            db.session.execute(text("DELETE FROM sqlite_stat1 WHERE tbl = 'reservation'"))
+        db.session.execute(text('PRAGMA user_version = 0'))
+        db.session.commit()
+
+        if not reuse:
+            began = time.perf_counter()
+            seed_lots(100, 50)
+            spot_ids = [spot_id for (spot_id,) in db.session.query(ParkingSpot.id)]
+            seed_reservations(args.rows, list(range(1, args.users + 1)), spot_ids, days=365)
+            print(f'Seeded {args.rows} reservations in {time.perf_counter() - began:.0f}s')
+        rows = db.session.execute(text('SELECT count(*) FROM reservation')).scalar()
+        print(f'{rows} reservations')
+
+        params = parameters(db)
+        before = report(db, 'before migrations', params, args.repeat)
+        db.session.commit()
+
+        began = time.perf_counter()
+        applied = upgrade()
+        print(f'\nApplied {len(applied)} migrations in {time.perf_counter() - began:.1f}s')
+        db.session.expire_all()
+        after = report(db, 'after migrations', params, args.repeat)
+
+        print(f"\n{'query':<55} {'before ms':>10} {'after ms':>9}")
+        for (name, _), old, new in zip(QUERIES, before, after):
+            print(f'{name:<55} {old:>10.2f} {new:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Columnar user-summary engine against the old per-reservation helpers.
+
+Seeds one user per size, then times both implementations for period=all and
+period=30 and checks the outputs are identical. Active sessions' duration and
+cost depend on the current time, so those two fields are left out of the check.
+
+    python bench/user_summary.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from harness import load_app, seed_lots, seed_reservations
+import reference_summary
+
+PERIODS = ('all', '30')
+
+
+def comparable(summary):
+    summary = json.loads(json.dumps(summary, default=str))
+    for session in summary['recentSessions']:
+        if session['status'] == 'active':
+            session.pop('duration')
+            session.pop('cost')
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    app = load_app()
+    from backend.analytics import load_columns, summarize
+    from backend.models import db, User, ParkingSpot, Reservation
+
+    print(f"{'reservations':>12} {'period':>6} {'old ms':>10} {'new ms':>9} {'speedup':>8} {'identical':>9}")
+    with app.app_context():
+        seed_lots(6, 5)
+        spot_ids = [spot_id for (spot_id,) in db.session.query(ParkingSpot.id)]
+        for size in args.sizes:
+            user = User(email=f'bench{size}@example.com', password='x', fs_uniquifier=f'bench-{size}', active=True)
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            seed_reservations(size, [user_id], spot_ids, days=60, seed=size)
+
+            for period in PERIODS:
+                start = None if period == 'all' else datetime.now() - timedelta(days=int(period))
+                # Id order is the rowid scan the old endpoint got before Reservation
+                # had indexes; float sums depend on it
+                query = Reservation.query.filter_by(user_id=user_id).order_by(Reservation.id)
+                if start:
+                    query = query.filter(Reservation.parking_timestamp >= start)
+
+                db.session.expire_all()
+                began = time.perf_counter()
+                old = reference_summary.summarize(query.all(), period)
+                old_ms = (time.perf_counter() - began) * 1000
+                db.session.expunge_all()
+
+                began = time.perf_counter()
+                new = summarize(load_columns(user_id, start), period)
+                new_ms = (time.perf_counter() - began) * 1000
+
+                same = comparable(old) == comparable(new)
+                print(f"{size:>12} {period:>6} {old_ms:>10.1f} {new_ms:>9.1f} {old_ms / new_ms:>7.1f}x {str(same):>9}")
+                if not same:
+                    for key in old:
+                        if comparable(old)[key] != comparable(new)[key]:
+                            print(f"  differs in {key}")
+
+
+if __name__ == '__main__':
+    main()
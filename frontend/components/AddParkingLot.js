@@ -50,6 +50,14 @@ export default {
           <label for="pincode">Pincode:</label>
           <input type="text" id="pincode" v-model="pincode" required>
         </div>
+        <div class="form-group">
+          <label for="latitude">Latitude (optional):</label>
+          <input type="number" id="latitude" v-model="latitude" step="any" min="-90" max="90">
+        </div>
+        <div class="form-group">
+          <label for="longitude">Longitude (optional):</label>
+          <input type="number" id="longitude" v-model="longitude" step="any" min="-180" max="180">
+        </div>
         <div class="form-group">
           <label for="price-per-hour">Price (Per Hour):</label>
           <input type="number" id="price" v-model="price" required>
@@ -71,6 +79,8 @@ export default {
       prime_location_name: '',
       address: '',
       pincode: '',
+      latitude: '',
+      longitude: '',
       price: '',
       number_of_spots: '',
       message: '',
@@ -93,6 +103,8 @@ export default {
             prime_location_name: this.prime_location_name,
             address: this.address,
             pincode: this.pincode,
+            latitude: this.latitude === '' ? null : Number(this.latitude),
+            longitude: this.longitude === '' ? null : Number(this.longitude),
             price: this.price,
             number_of_spots: this.number_of_spots
           })
@@ -5,7 +5,7 @@ export default {
     return {
       user: null,
       lot: null,
-      availableSpots: [],
+      availableCount: 0,
       assignedSpot: null,
       vehicleNumber: '',
       loading: true,
@@ -34,10 +34,7 @@ export default {
         return this.$router.push('/login');
       }
       await this.loadLot(lotId);
-      await this.loadAvailableSpots(lotId);
-      if (this.availableSpots.length > 0) {
-        this.assignedSpot = this.availableSpots[0];
-      }
+      await this.loadNextAvailableSpot(lotId);
       this.vehicleNumber = this.user.vehicle_number || '';
     } catch (error) {
       this.error = 'Failed to load booking page: ' + error.message;
@@ -81,16 +78,17 @@ export default {
       }
     },
 
-    async loadAvailableSpots(lotId) {
+    async loadNextAvailableSpot(lotId) {
       try {
-        const response = await fetch(`/api/parkingspots/available`, {
+        const response = await fetch(`/api/parkingspots/next-available?lot_id=${lotId}`, {
           headers: {
             'Authorization': `Bearer ${this.user.token}`
           }
         });
         if (response.ok) {
-          const allAvailableSpots = await response.json();
-          this.availableSpots = allAvailableSpots.filter(spot => spot.lot_id == lotId);
+          const result = await response.json();
+          this.assignedSpot = result.spot;
+          this.availableCount = result.available_spots;
         }
       } catch (err) {
         // Silent fail
@@ -240,7 +238,7 @@ export default {
           </div>
 
           <!-- No spots available message -->
-          <div v-if="!assignedSpot && availableSpots.length === 0" class="alert alert-warning mt-3">
+          <div v-if="!assignedSpot && availableCount === 0" class="alert alert-warning mt-3">
             <i class="fas fa-exclamation-triangle"></i>
             No available spots found for this location.
           </div>
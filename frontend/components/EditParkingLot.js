@@ -40,6 +40,8 @@ export default {
       prime_location_name: '',
       address: '',
       pincode: '',
+      latitude: '',
+      longitude: '',
       price: '',
       number_of_spots: '',
       originalData: {},
@@ -85,6 +87,8 @@ export default {
     this.prime_location_name = data.prime_location_name;
     this.address = data.address;
     this.pincode = data.pincode;
+    this.latitude = data.latitude ?? '';
+    this.longitude = data.longitude ?? '';
     this.price = data.price;
     this.number_of_spots = data.number_of_spots;
     this.originalData = { ...data };
@@ -119,6 +123,8 @@ export default {
         prime_location_name: this.prime_location_name,
         address: this.address,
         pincode: this.pincode,
+        latitude: this.latitude === '' ? null : Number(this.latitude),
+        longitude: this.longitude === '' ? null : Number(this.longitude),
         price: parseInt(this.price),
         number_of_spots: parseInt(this.number_of_spots),
       };
@@ -182,6 +188,14 @@ export default {
           <label for="pincode">Pincode:</label>
           <input type="text" id="pincode" v-model="pincode" required>
         </div>
+        <div class="form-group">
+          <label for="latitude">Latitude (optional):</label>
+          <input type="number" id="latitude" v-model="latitude" step="any" min="-90" max="90">
+        </div>
+        <div class="form-group">
+          <label for="longitude">Longitude (optional):</label>
+          <input type="number" id="longitude" v-model="longitude" step="any" min="-180" max="180">
+        </div>
         <div class="form-group">
           <label for="price">Price Per Hour:</label>
           <input type="number" id="price" v-model.number="price" required>
@@ -28,8 +28,7 @@ export default {
       exporting: false,
       csvReady: false,
       csvMessage: "",
-      exportTaskId: null,
-      exportPollInterval: null
+      exportTaskId: null
     };
   },
 
@@ -106,47 +105,60 @@ export default {
     });
         if (!res.ok) throw new Error("Failed to start export");
         const data = await res.json();
+        if (data.download_url) {
+          // Nothing changed since the last export; it is ready already
+          const fileRes = await fetch(data.download_url, {
+            headers: {
+              "Authorization": `Bearer ${user.token}`
+            }
+          });
+          if (!fileRes.ok) throw new Error("Failed to download export");
+          await this.saveExport(fileRes);
+          return;
+        }
         this.exportTaskId = data.task_id;
-        this.exportPollInterval = setInterval(this.pollExportStatus, 1500);
+        this.waitForExport();
       } catch (e) {
         this.csvMessage = "Failed to start CSV export.";
         this.exporting = false;
       }
     },
-    async pollExportStatus() {
-      if (!this.exportTaskId) return;
+    async waitForExport() {
       const userStr = localStorage.getItem("user");
       const user = userStr ? JSON.parse(userStr) : null;
+      const headers = { "Authorization": `Bearer ${user.token}` };
       try {
-        const res = await fetch(`/api/user-csv-export/${this.exportTaskId}`, {
-          headers: {
-            "Authorization": `Bearer ${user.token}`
-          }
-        });
-        if (res.status === 200) {
-          // CSV is ready, download it
-          const blob = await res.blob();
-          const url = window.URL.createObjectURL(blob);
-          const a = document.createElement("a");
-          a.href = url;
-          a.download = "my_parking_history.csv";
-          document.body.appendChild(a);
-          a.click();
-          a.remove();
-          window.URL.revokeObjectURL(url);
-          clearInterval(this.exportPollInterval);
-          this.exporting = false;
-          this.csvMessage = "CSV file has been downloaded!";
+        // Each request is held open by the server until the export finishes
+        // or its wait times out, in which case we simply ask again
+        while (this.exportTaskId) {
+          const res = await fetch(`/api/user-csv-export/${this.exportTaskId}/wait`, { headers });
+          if (res.status === 202) continue;
+          if (!res.ok) throw new Error("Export failed");
+          const data = await res.json();
           this.exportTaskId = null;
+          const fileRes = await fetch(data.download_url, { headers });
+          if (!fileRes.ok) throw new Error("Failed to download export");
+          await this.saveExport(fileRes);
         }
-        // else: still pending, keep polling
       } catch (e) {
-        clearInterval(this.exportPollInterval);
         this.exporting = false;
         this.csvMessage = "Failed to download CSV.";
         this.exportTaskId = null;
       }
     },
+    async saveExport(res) {
+      const blob = await res.blob();
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement("a");
+      a.href = url;
+      a.download = "my_parking_history.csv";
+      document.body.appendChild(a);
+      a.click();
+      a.remove();
+      window.URL.revokeObjectURL(url);
+      this.exporting = false;
+      this.csvMessage = "CSV file has been downloaded!";
+    },
     goToSummary(){
       this.$router.push('/user-summary');
     },
@@ -205,14 +217,19 @@ export default {
       try {
         if (!this.user) return;
 
-        const response = await fetch(`/api/bookings/user/${this.user.id}`, {
-          headers: {
-            "Authorization": `Bearer ${this.user.token}`
-          }
-        });
-
-        if (response.ok) {
-          this.parkingHistory = await response.json();
+        // Only the five newest bookings are shown; active ones are fetched
+        // separately so hasActiveBooking sees them even when they are older
+        const headers = { "Authorization": `Bearer ${this.user.token}` };
+        const [recentResponse, activeResponse] = await Promise.all([
+          fetch(`/api/bookings/user/${this.user.id}?limit=5`, { headers }),
+          fetch(`/api/bookings/user/${this.user.id}?status=A`, { headers })
+        ]);
+
+        if (recentResponse.ok && activeResponse.ok) {
+          const recent = (await recentResponse.json()).bookings;
+          const active = await activeResponse.json();
+          const seen = new Set(recent.map(b => b.id));
+          this.parkingHistory = recent.concat(active.filter(b => !seen.has(b.id)));
           // Sort by created_at descending to show newest first
           this.parkingHistory.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
         }
@@ -227,20 +244,10 @@ export default {
         if (response.ok) {
           const lots = await response.json();
 
-          // Process each lot to get real-time availability
+          // available_spots comes back with every lot from a single grouped query
           for (let lot of lots) {
-            // The API endpoint /api/parkingspots/available returns spots with status 'A' (Available)
-            // So this gives us the count of available spots
-            const availableCount = await this.getActualAvailableSpots(lot.id);
-            
-            // Set the values correctly:
-            // - total_spots: total spots from lot data (number_of_spots)  
-            // - available_spots: current available spots from API call
             lot.total_spots = lot.number_of_spots || 0;
-            lot.available_spots = availableCount;
-            
-            // Debug logging to verify the data
-            console.log(`Lot ${lot.id}: Available=${availableCount}, Total=${lot.total_spots}`);
+            lot.available_spots = lot.available_spots || 0;
           }
 
           this.parkingLots = lots;
@@ -250,27 +257,6 @@ export default {
       }
     },
 
-    async getActualAvailableSpots(lotId) {
-      try {
-        if (!this.user) return 0;
-
-        const response = await fetch(`/api/parkingspots/available?lot_id=${lotId}`, {
-          headers: {
-            "Authorization": `Bearer ${this.user.token}`
-          }
-        });
-
-        if (response.ok) {
-          const spots = await response.json();
-          return spots.length;
-        } else {
-          return 0;
-        }
-      } catch (error) {
-        return 0;
-      }
-    },
-
     getLocationName(lotId) {
       const lot = this.parkingLots.find(l => l.id === lotId);
       return lot ? lot.prime_location_name : 'Unknown Location';
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds the app at import time, so point it at a throwaway database
+# and an in-process cache before it is imported
+from backend import config
+
+_db_dir = tempfile.mkdtemp(prefix='parkez-tests-')
+config.LocalDevelopmentConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(_db_dir, 'test.sqlite3')}"
+config.LocalDevelopmentConfig.CACHE_TYPE = 'SimpleCache'
+config.LocalDevelopmentConfig.DEBUG = False
+
+import app as app_module  # noqa: E402
+from backend.models import db, ParkingLot  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app_module.app.config['TESTING'] = True
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def admin_token(client):
+    res = client.post('/login', json={'email': 'admin@gmail.com', 'password': 'admin'})
+    return res.get_json()['token']
+
+
+@pytest.fixture
+def make_user(client):
+    """Register and log in a user; returns the login payload (id, token, ...)"""
+    def make(email):
+        client.post('/register', json={
+            'email': email, 'password': 'p', 'full_name': 'Test User',
+            'address': 'addr', 'phone_number': '1', 'age': 30
+        })
+        return client.post('/login', json={'email': email, 'password': 'p'}).get_json()
+    return make
+
+
+@pytest.fixture
+def make_lot(app, client, admin_token):
+    """Create a lot through the API; returns its id"""
+    def make(name, spots, price=10):
+        res = client.post('/api/parkinglots', json={
+            'prime_location_name': name, 'price': price, 'address': f'{name} road',
+            'pincode': '500001', 'number_of_spots': spots
+        }, headers=auth(admin_token))
+        assert res.status_code == 200, res.get_json()
+        with app.app_context():
+            return ParkingLot.query.filter_by(prime_location_name=name).one().id
+    return make
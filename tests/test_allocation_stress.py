@@ -0,0 +1,59 @@
+import collections
+import threading
+import time
+from sqlalchemy import func
+from backend.models import db, ParkingSpot, Reservation, LotOccupancy
+from conftest import auth
+
+THREADS = 16
+BOOKINGS_PER_THREAD = 10
+SPOTS = 40
+
+
+def test_concurrent_bookings_never_share_a_spot(app, make_user, make_lot):
+    """Threads race for more bookings than the lot has spots, by spot id and by lot"""
+    lot_id = make_lot('Stress Lot', SPOTS)
+    user = make_user('stress@example.com')
+    with app.app_context():
+        spot_ids = [spot_id for (spot_id,) in db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id)]
+
+    statuses = collections.Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def book(worker):
+        client = app.test_client()
+        start.wait()
+        for attempt in range(BOOKINGS_PER_THREAD):
+            body = {'user_id': user['id'], 'vehicle_number': f'TS{worker}-{attempt}', 'lot_id': lot_id}
+            if attempt % 2:
+                # Half the requests fight over the same few specific spots
+                body['spot_id'] = spot_ids[(worker + attempt) % 4]
+            res = client.post('/api/bookings', json=body, headers=auth(user['token']))
+            with lock:
+                statuses[res.status_code] += 1
+
+    threads = [threading.Thread(target=book, args=(worker,)) for worker in range(THREADS)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    print(f"\n{statuses[201]} bookings out of {THREADS * BOOKINGS_PER_THREAD} attempts "
+          f"in {elapsed:.2f}s ({statuses[201] / elapsed:.0f} bookings/s, "
+          f"{THREADS * BOOKINGS_PER_THREAD / elapsed:.0f} requests/s)")
+
+    assert statuses[201] == SPOTS
+    assert set(statuses) <= {201, 400}
+
+    with app.app_context():
+        per_spot = db.session.query(Reservation.spot_id, func.count(Reservation.id))\
+            .filter(Reservation.spot_id.in_(spot_ids))\
+            .group_by(Reservation.spot_id).all()
+        assert all(count <= 1 for _, count in per_spot)
+        assert len(per_spot) == SPOTS
+        assert ParkingSpot.query.filter_by(lot_id=lot_id, status='A').count() == 0
+        counts = db.session.get(LotOccupancy, lot_id)
+        assert (counts.available_spots, counts.occupied_spots) == (0, SPOTS)
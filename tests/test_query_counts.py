@@ -0,0 +1,103 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from backend.models import db, ParkingSpot, Reservation
+from backend.user_rollups import rebuild_rollups
+from conftest import auth
+
+# Statements each endpoint may issue, whatever the number of reservations
+STATEMENT_BUDGETS = {
+    '/api/bookings/user/{id}': 1,
+    '/api/bookings/user/{id}?limit=20': 1,
+    '/api/user-summary/{id}?period=all': 4,
+    '/api/user-summary/{id}?period=30': 4,
+}
+SIZES = (20, 200)
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def seed_reservations(user_id, spot_ids, count):
+    rng = random.Random(count)
+    now = datetime.now()
+    for i in range(count):
+        start = now - timedelta(days=rng.randint(1, 60), minutes=rng.randint(0, 1440))
+        done = i % 10 != 0
+        db.session.add(Reservation(
+            spot_id=rng.choice(spot_ids),
+            user_id=user_id,
+            vehicle_number=f'QC{i}',
+            parking_timestamp=start,
+            leaving_timestamp=start + timedelta(minutes=rng.randint(15, 600)) if done else None,
+            parking_cost=rng.choice([20.0, 35.0]) if done else None
+        ))
+    db.session.flush()
+    rebuild_rollups(user_id)
+    db.session.commit()
+
+
+@pytest.fixture(scope='module')
+def seeded_users(app):
+    """One user per size, with reservations spread over three lots"""
+    client = app.test_client()
+    admin = client.post('/login', json={'email': 'admin@gmail.com', 'password': 'admin'}).get_json()['token']
+    users = {}
+    for n in range(3):
+        client.post('/api/parkinglots', json={
+            'prime_location_name': f'Count Lot {n}', 'price': 10 + n, 'address': f'{n} count road',
+            'pincode': '500002', 'number_of_spots': 5
+        }, headers=auth(admin))
+    with app.app_context():
+        spot_ids = [spot_id for (spot_id,) in db.session.query(ParkingSpot.id)
+                    .join(ParkingSpot.lot).filter_by(pincode='500002')]
+    for size in SIZES:
+        email = f'count{size}@example.com'
+        client.post('/register', json={
+            'email': email, 'password': 'p', 'full_name': 'Count User',
+            'address': 'addr', 'phone_number': '1', 'age': 30
+        })
+        user = client.post('/login', json={'email': email, 'password': 'p'}).get_json()
+        with app.app_context():
+            seed_reservations(user['id'], spot_ids, size)
+        users[size] = user
+    return users
+
+
+def statements_for(app, user, path):
+    client = app.test_client()
+    url = path.format(id=user['id'])
+    # Resolve the token first so the auth cache is warm for every size alike
+    client.get(f"/api/bookings/user/{user['id']}?limit=1", headers=auth(user['token']))
+    with app.app_context(), count_statements() as statements:
+        res = client.get(url, headers=auth(user['token']))
+    assert res.status_code == 200, res.get_json()
+    return len(statements), res.get_json()
+
+
+@pytest.mark.parametrize('path', list(STATEMENT_BUDGETS))
+@pytest.mark.parametrize('from_rollups', [True, False])
+def test_statement_count_does_not_grow_with_rows(app, seeded_users, path, from_rollups, monkeypatch):
+    monkeypatch.setitem(app.config, 'USER_SUMMARY_FROM_ROLLUPS', from_rollups)
+    counts = {}
+    for size, user in seeded_users.items():
+        counts[size], body = statements_for(app, user, path)
+        if path == '/api/bookings/user/{id}':
+            assert len(body) == size
+            assert all(booking['lot_id'] is not None for booking in body)
+    assert counts[SIZES[0]] == counts[SIZES[1]], counts
+    assert counts[SIZES[1]] <= STATEMENT_BUDGETS[path], counts